@@ -1,10 +1,9 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import UploadFile, File, Form
-import httpx
 from urllib.parse import urlparse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from config import settings
 from main import (
@@ -13,15 +12,114 @@ from main import (
     extract_post_context,
     generate_engaging_comment,
     identify_trending_topics,
+    stream_trending_topics,
+    generate_comments_stream,
+    image_cache,
 )
-from main import analyze_text_to_brief, transcribe_media_bytes, transcribe_from_url, SocialMediaBrief, get_related_instagram_posts, get_related_linkedin_posts, get_related_twitter_posts
+from main import analyze_text_to_brief, transcribe_cached, transcribe_from_url, SocialMediaBrief, get_related_instagram_posts, get_related_linkedin_posts, get_related_twitter_posts
+from apify import actor_cache
+from clients import init_clients, close_clients
+from llm_governor import openai_governor
+from llm_metrics import llm_metrics, request_id_var, endpoint_var
+from media import MediaTooLargeError, file_size
+from image_proxy import proxy_image_response, proxy_cache, variant_cache, close_image_proxy
+from contextlib import asynccontextmanager
 import json
 import asyncio
+import uuid
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared, pooled HTTP/Apify/OpenAI clients live for the whole app
+    await init_clients()
+    yield
+    await close_clients()
+    close_image_proxy()
+
 
 app = FastAPI(
     title=settings.app_name, 
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan,
+)
+
+
+class _UploadTooLarge(Exception):
+    pass
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Refuse media uploads to path over max_bytes (plus overhead_bytes of request
+    framing, e.g. multipart boundaries) with a 413 that reports max_bytes.
+    Content-Length is checked before the body is read; chunked uploads (no
+    Content-Length) are counted as they stream and cut off as soon as they go
+    over, so an oversized body is never spooled in full.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int, overhead_bytes: int = 0):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_body_bytes = max_bytes + overhead_bytes
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload too large, limit is {self.max_bytes} bytes"},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            return await self._reject(scope, receive, send)
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    too_large = True
+                    raise _UploadTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            # Once the body went over, whatever the app answers (e.g. a 400 for the
+            # aborted form parse) is replaced by the 413 below
+            if too_large:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _UploadTooLarge:
+            pass
+        if too_large and not response_started:
+            await self._reject(scope, receive, send)
+
+
+# Multipart framing on top of the media itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Registered before CORSMiddleware so CORS wraps it and its 413s carry CORS headers
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path="/analyze/video",
+    max_bytes=settings.media_max_bytes,
+    overhead_bytes=MULTIPART_OVERHEAD_BYTES,
 )
 
 # Allow CORS for local development UI
@@ -34,6 +132,21 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag everything done for this request (e.g. LLM usage) with a request id and the endpoint"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    request_id_token = request_id_var.set(request_id)
+    endpoint_token = endpoint_var.set(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(request_id_token)
+        endpoint_var.reset(endpoint_token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 print(settings.openai_api_key)
 
 class ActionResponse(BaseModel):
@@ -42,6 +155,8 @@ class ActionResponse(BaseModel):
     comment: Optional[str] = None
     caption: Optional[str] = None
     img_url: Optional[str] = None
+    engagement_score: Optional[int] = None  # 0-7 score the post was selected with
+    rank: Optional[int] = None  # 1 = best post selected for this keyword
 
 class KeywordRequest(BaseModel):
     keyword: str
@@ -94,7 +209,7 @@ async def get_actions(request: KeywordRequest):
     
     try:
         # Generate real actions based on the keyword
-        actions = await get_actions_for_keyword(keyword, max_posts=12)
+        actions = await get_actions_for_keyword(keyword, max_posts=settings.comment_llm_budget)
         
         # If no actions found, return generic actions as fallback
         if not actions:
@@ -112,19 +227,47 @@ async def health_check():
     return {"status": "healthy", "message": "API is operational"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Hit/miss counters and sizes of the Apify actor result and processed image caches
+    """
+    return {
+        "actor_cache": actor_cache.stats(),
+        "image_cache": image_cache.stats(),
+        "proxy_cache": proxy_cache.stats(),
+        "proxy_variant_cache": variant_cache.stats(),
+    }
+
+
+@app.get("/metrics/llm")
+async def llm_usage_metrics(request_id: Optional[str] = None):
+    """
+    OpenAI usage since startup: calls, prompt/cached/completion tokens, images,
+    latency and estimated cost, in total and per endpoint, model and recent request,
+    plus the most recent calls and the rate governor's queues.
+    Pass request_id (as returned in X-Request-ID) for a single request's calls.
+    """
+    if request_id:
+        return llm_metrics.snapshot(request_id)
+    return {**llm_metrics.snapshot(), "governor": openai_governor.stats()}
+
+
 class CreatorsRequest(BaseModel):
     keyword: str
     country: Optional[str] = None
     followers_count_gt: Optional[int] = None
     followers_count_lt: Optional[int] = None
     sort_by_emergence: Optional[bool] = False
+    limit: Optional[int] = Field(None, ge=1)
 
 
 @app.post("/creators")
 async def get_creators_post_api(request: CreatorsRequest):
     """
     POST: Accepts JSON body with keyword, country and optional follower filters.
-    If sort_by_emergence is True, calculates emergence scores and sorts by growth potential.
+    If sort_by_emergence is True, calculates emergence scores and sorts by growth potential,
+    returning only the top `limit` creators when limit is set.
     """
     keyword = (request.keyword or "").strip()
     country = (request.country or "").strip()
@@ -139,13 +282,27 @@ async def get_creators_post_api(request: CreatorsRequest):
     if country:
         filters["country"] = country
 
-    return await get_creators(keyword, filters, sort_by_emergence=request.sort_by_emergence or False)
+    return await get_creators(
+        keyword,
+        filters,
+        sort_by_emergence=request.sort_by_emergence or False,
+        top_k=request.limit,
+    )
 
 @app.get("/proxy-image")
-async def proxy_image(url: str):
+async def proxy_image(
+    url: str,
+    request: Request,
+    width: Optional[int] = Query(None, ge=1, le=2048),
+    format: Optional[str] = Query(None, description="avif, webp or jpeg; negotiated from Accept when omitted"),
+):
     """
     Image proxy to bypass CDN CORS/CORP for profile pictures.
     Only allows known instagram/fb cdn hosts.
+    Responses are streamed, cached locally and revalidated with ETag/Last-Modified.
+    Pass width and/or format to get a resized WebP/AVIF/JPEG thumbnail instead
+    (e.g. ?width=48 for avatars); widths snap up to PROXY_VARIANT_WIDTHS,
+    and a width above the largest of them returns the original size.
     """
     parsed = urlparse(url)
     allowed_hosts = (
@@ -156,28 +313,12 @@ async def proxy_image(url: str):
     if not any(host in parsed.netloc for host in allowed_hosts):
         raise HTTPException(status_code=400, detail="Host not allowed")
 
-    try:
-        async with httpx.AsyncClient(timeout=10.0, follow_redirects=True, headers={
-            "User-Agent": "Mozilla/5.0",
-            "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
-            "Referer": "https://www.instagram.com/",
-        }) as client:
-            r = await client.get(url)
-        if r.status_code != 200:
-            raise HTTPException(status_code=r.status_code, detail="Failed to fetch image")
-        content_type = r.headers.get("Content-Type", "image/jpeg")
-        headers = {
-            "Content-Type": content_type,
-            "Cache-Control": "public, max-age=3600",
-            "Access-Control-Allow-Origin": "*",
-        }
-        return Response(content=r.content, headers=headers)
-    except httpx.RequestError as exc:
-        raise HTTPException(status_code=502, detail=f"Upstream error: {exc}")
+    return await proxy_image_response(url, request.headers, width=width, fmt=format)
 
 
 class BlogpostRequest(BaseModel):
     text: str
+    refresh: bool = False  # bypass the cached brief for this text
 
 
 class BlogpostBriefResponse(SocialMediaBrief):
@@ -220,7 +361,7 @@ async def analyze_blogpost(request: BlogpostRequest):
     text = (request.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="text cannot be empty")
-    brief = await analyze_text_to_brief(text)
+    brief = await analyze_text_to_brief(text, refresh=request.refresh)
     return brief
 
 
@@ -232,24 +373,39 @@ class VideoBriefResponse(SocialMediaBrief):
 async def analyze_video(
     url: Optional[str] = Form(default=None),
     file: Optional[UploadFile] = File(default=None),
+    refresh: bool = Form(default=False),
 ):
+    """
+    Transcribe a video (by URL or upload) and turn the transcript into a brief.
+    Transcripts are cached by the media's SHA-256 and briefs by the transcript text;
+    refresh=true bypasses both caches.
+    """
     if not url and not file:
         raise HTTPException(status_code=400, detail="Provide either url or file")
 
     transcript = ""
     try:
         if url:
-            transcript = await transcribe_from_url(url)
+            transcript = await transcribe_from_url(url, refresh=refresh)
         else:
-            content = await file.read()
-            transcript = await transcribe_media_bytes(content, file.filename or "upload.mp4")
+            # Starlette has already spooled the upload to a temp file; hand that file
+            # to transcription directly instead of reading it into memory
+            size = file.size if file.size is not None else file_size(file.file)
+            if size > settings.media_max_bytes:
+                raise MediaTooLargeError(settings.media_max_bytes, size)
+            transcript = await transcribe_cached(file.file, file.filename or "upload.mp4", refresh=refresh)
+    except MediaTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    finally:
+        if file is not None:
+            await file.close()
     print(transcript)
     if not transcript:
         raise HTTPException(status_code=422, detail="Empty transcript")
 
-    brief = await analyze_text_to_brief(transcript)
+    brief = await analyze_text_to_brief(transcript, refresh=refresh)
     return VideoBriefResponse(**brief.model_dump(), transcript=transcript)
 
 
@@ -281,23 +437,69 @@ class GenerateCommentRequest(BaseModel):
 
 class GenerateCommentResponse(BaseModel):
     comment: str
+    vision_detail: Optional[str] = None
+    image_count: int = 0
+    image_payload_bytes: int = 0
+    image_tokens: int = 0
 
 
 @app.post("/generate-comment", response_model=GenerateCommentResponse)
 async def generate_comment(req: GenerateCommentRequest):
     try:
         context = extract_post_context(req.post)
+        vision_stats = {}
         comment = await generate_engaging_comment(
             context,
             req.keywords,
             req.prior_post_text,
             req.custom_instructions,
+            vision_stats=vision_stats,
         )
-        return {"comment": comment.strip("\"").strip("\'")}
+        return {"comment": comment.strip("\"").strip("\'"), **vision_stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate comment: {str(e)}")
 
 
+class GenerateCommentsRequest(BaseModel):
+    items: List[GenerateCommentRequest]
+    concurrency: Optional[int] = None
+
+
+@app.post("/generate-comments")
+async def generate_comments(req: GenerateCommentsRequest):
+    """
+    Batch version of /generate-comment, streamed as NDJSON: one line per post
+    as soon as its comment is ready, {"index", "post_url", "comment", ...vision stats}
+    or {"index", "post_url", "error"} for posts that failed, then a final
+    {"done": true, "succeeded", "failed"} line.
+    """
+    if not req.items:
+        raise HTTPException(status_code=400, detail="items cannot be empty")
+    if len(req.items) > settings.comment_batch_max_posts:
+        raise HTTPException(status_code=400, detail=f"At most {settings.comment_batch_max_posts} posts per batch")
+
+    concurrency = max(1, min(req.concurrency or settings.comment_batch_concurrency, settings.comment_batch_concurrency))
+
+    async def ndjson_stream():
+        succeeded = failed = 0
+        async for result in generate_comments_stream([item.model_dump() for item in req.items], concurrency):
+            if "error" in result:
+                failed += 1
+            else:
+                succeeded += 1
+            yield json.dumps(result, default=str) + "\n"
+        yield json.dumps({"done": True, "succeeded": succeeded, "failed": failed}) + "\n"
+
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
 @app.post("/related-posts/linkedin")
 async def related_linkedin_posts(req: RelatedPostsRequest):
     """
@@ -377,3 +579,32 @@ async def get_trending_topics_endpoint(request: TrendingTopicsRequest):
         )
 
 
+@app.post("/trending-topics/stream")
+async def stream_trending_topics_endpoint(request: TrendingTopicsRequest):
+    """
+    Same as /trending-topics, streamed as Server-Sent Events: fetch progress per
+    platform/keyword, then the hashtag leaderboard, then the conversation clusters.
+    """
+    if not request.niche_keywords:
+        raise HTTPException(status_code=400, detail="niche_keywords cannot be empty")
+
+    async def event_stream():
+        try:
+            async for event, data in stream_trending_topics(
+                request.niche_keywords,
+                request.platforms or ["instagram", "linkedin", "twitter"],
+                request.timeframe_hours or 24
+            ):
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        except Exception as e:
+            print(f"Error in trending topics stream: {str(e)}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -1,15 +1,80 @@
-from apify_client import ApifyClient
+from cache import ActorCache, build_cache_backend
+from clients import get_apify_client
 from config import settings
+from singleflight import SingleFlight
+import copy
 import os
 
 
-def search_instagram_posts_by_keywords(keywords, limit=10):
+# Cache of actor results shared by every scraper below
+actor_cache = ActorCache(
+    build_cache_backend(
+        settings.actor_cache_backend,
+        settings.actor_cache_path,
+        settings.actor_cache_max_bytes,
+    ),
+    ttls=settings.actor_cache_ttls,
+    default_ttl=settings.actor_cache_default_ttl,
+)
+
+# In-flight actor runs, so concurrent identical scrapes share one run
+actor_flights = SingleFlight()
+
+
+async def run_actor(actor_id, run_input, cache_ttl=None, wait_secs=None):
     """
-    Search for Instagram posts by keyword using hashtag search
+    Run an Apify actor without blocking the event loop and return
+    every item from its default dataset.
+    Results are served from actor_cache when an identical run is still fresh;
+    cache_ttl overrides the per-actor TTL for actors used for several purposes.
+    Identical runs requested concurrently share a single actor run.
+    If wait_secs is given and the run is still going after that long, it is
+    aborted and the items scraped so far are returned (and not cached).
     """
-    # Initialize the ApifyClient with your API token
-    client = ApifyClient(settings.apify_api_token)
+    cached = await actor_cache.aget(actor_id, run_input)
+    if cached is not None:
+        print(f"♻️  Cache hit for {actor_id} ({len(cached)} items)")
+        return cached
+
+    key = ActorCache.make_key(actor_id, run_input)
+    items, shared = await actor_flights.do(key, _call_actor, actor_id, run_input, cache_ttl, wait_secs)
+
+    # Callers mutate the returned posts, so each gets its own copy of a shared result
+    return copy.deepcopy(items) if shared else items
+
+
+async def _call_actor(actor_id, run_input, cache_ttl=None, wait_secs=None):
+    client = get_apify_client()
+
+    # Run the Actor and wait for it to finish (or for wait_secs to pass)
+    run = await client.actor(actor_id).call(run_input=run_input, wait_secs=wait_secs)
+
+    # Fetch all items from the run's dataset
+    items = []
+    async for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+        items.append(item)
+
+    status = run.get("status")
+    if status in ("READY", "RUNNING"):
+        print(f"⏱️  {actor_id} still {status} after {wait_secs}s, returning {len(items)} partial items")
+        try:
+            await client.run(run["id"]).abort()
+        except Exception as e:
+            print(f"⚠️  Failed to abort {actor_id} run {run['id']}: {e}")
+        return items
 
+    # Don't pin empty results; they are usually transient
+    if items and status == "SUCCEEDED":
+        await actor_cache.aset(actor_id, run_input, items, ttl=cache_ttl)
+    return items
+
+
+async def search_instagram_posts_by_keywords(keywords, limit=10, timeout_secs=None):
+    """
+    Search for Instagram posts by keyword using hashtag search
+    With timeout_secs, a run that hasn't finished in time is aborted and
+    the posts scraped so far are returned.
+    """
     # Prepare the Actor input for keyword search
     run_input = {
         "hashtags": [''.join(c for c in keyword if c.isalpha()) for keyword in keywords],
@@ -19,26 +84,16 @@ def search_instagram_posts_by_keywords(keywords, limit=10):
     }
     # print(run_input)
 
-    # Run the Actor and wait for it to finish
-    run = client.actor("apify/instagram-hashtag-scraper").call(run_input=run_input)
-
-    # print(run)
-
-    # Fetch and return all posts from the search results
-    posts = []
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        posts.append(item)
+    # Run the Actor and fetch all posts from the search results
+    posts = await run_actor("apify/instagram-hashtag-scraper", run_input, wait_secs=timeout_secs)
     print(len(posts), "posts found!")
     return posts
 
 
-def search_instagram_posts_by_keyword(keyword):
+async def search_instagram_posts_by_keyword(keyword):
     """
     Search for Instagram posts by keyword using hashtag search
     """
-    # Initialize the ApifyClient with your API token
-    client = ApifyClient(settings.apify_api_token)
-
     # Prepare the Actor input for keyword search
     run_input = {
         "addParentData": False,
@@ -53,20 +108,17 @@ def search_instagram_posts_by_keyword(keyword):
         "onlyPostsNewerThan": "12 months"
     }
 
-    # Run the Actor and wait for it to finish
-    run = client.actor("apify/instagram-scraper").call(run_input=run_input)
-
-    # Fetch and return all posts from the search results
-    posts = []
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        posts.append(item)
+    # Run the Actor and fetch all posts from the search results
+    posts = await run_actor("apify/instagram-scraper", run_input)
     print(len(posts), "posts found!")
     return posts
 
-def scrape_instagram_profile(profile_urls):
-    # Initialize the ApifyClient with your API token
-    client = ApifyClient(settings.apify_api_token)
-
+async def scrape_instagram_profile(profile_urls, timeout_secs=None):
+    """
+    Scrape Instagram profile details for profile_urls.
+    With timeout_secs, a run that hasn't finished in time is aborted and
+    the profiles scraped so far are returned.
+    """
     # Prepare the Actor input
     run_input = {
         "addParentData": False,
@@ -74,15 +126,14 @@ def scrape_instagram_profile(profile_urls):
         "resultsType": "details", 
     }
 
-    # Run the Actor and wait for it to finish
-    run = client.actor("apify/instagram-scraper").call(run_input=run_input)
-
-    # Fetch and print Actor results from the run's dataset (if there are any)
-    results = []
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        results.append(format_ig_profile(item))
-        
-    return results
+    # Run the Actor and format the profiles from the run's dataset (if there are any)
+    items = await run_actor(
+        "apify/instagram-scraper",
+        run_input,
+        cache_ttl=settings.profile_cache_ttl,
+        wait_secs=timeout_secs,
+    )
+    return [format_ig_profile(item) for item in items]
 
 def remove_child_posts(apify_post):
     """Remove childPosts field from a post dictionary while preserving all other fields."""
@@ -99,14 +150,13 @@ def format_ig_profile(apify_profile):
     return profile
 
 
-def search_linkedin_posts_by_keyword(keyword: str, limit: int = 10, sort_type: str = "relevance"):
+async def search_linkedin_posts_by_keyword(keyword: str, limit: int = 10, sort_type: str = "relevance", timeout_secs=None):
     """
     Search for LinkedIn posts by keyword using Apify LinkedIn Posts Search Scraper (No Cookies)
     Actor: apimaestro/linkedin-posts-search-scraper-no-cookies
     sort_type: relevance, date_posted
+    With timeout_secs, an unfinished run is aborted and its partial posts returned.
     """
-    client = ApifyClient(settings.apify_api_token)
-    
     # Prepare the Actor input for keyword search
     run_input = {
         "keyword": keyword,
@@ -116,25 +166,17 @@ def search_linkedin_posts_by_keyword(keyword: str, limit: int = 10, sort_type: s
         "date_filter": ""  # Empty means no date filter
     }
     
-    # Run the Actor and wait for it to finish
-    run = client.actor("apimaestro/linkedin-posts-search-scraper-no-cookies").call(run_input=run_input)
-    
-    # Fetch and return all posts from the search results
-    posts = []
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        posts.append(item)
-    
-    return posts
+    # Run the Actor and fetch all posts from the search results
+    return await run_actor("apimaestro/linkedin-posts-search-scraper-no-cookies", run_input, wait_secs=timeout_secs)
 
 
-def search_twitter_posts_by_keyword(keyword: str, limit: int = 10, search_type: str = "Top"):
+async def search_twitter_posts_by_keyword(keyword: str, limit: int = 10, search_type: str = "Top", timeout_secs=None):
     """
     Search for Twitter/X posts by keyword using Apify Twitter Scraper PPR
     Actor: danek/twitter-scraper-ppr
     search_type: Top, Latest
+    With timeout_secs, an unfinished run is aborted and its partial posts returned.
     """
-    client = ApifyClient(settings.apify_api_token)
-    
     # Prepare the Actor input for keyword search
     run_input = {
         "query": keyword,
@@ -143,11 +185,11 @@ def search_twitter_posts_by_keyword(keyword: str, limit: int = 10, search_type:
     }
     
     # Run the Actor and wait for it to finish
-    run = client.actor("danek/twitter-scraper-ppr").call(run_input=run_input)
+    items = await run_actor("danek/twitter-scraper-ppr", run_input, wait_secs=timeout_secs)
     
-    # Fetch and format all posts from the search results
+    # Format all posts from the search results
     posts = []
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+    for item in items:
         print("*"*100)
         print(item)
         print("*"*100)
@@ -193,13 +235,11 @@ def search_twitter_posts_by_keyword(keyword: str, limit: int = 10, search_type:
     return posts
 
 
-def get_tiktok_trending_hashtags(country: str = "US", industry: str = ""):
+async def get_tiktok_trending_hashtags(country: str = "US", industry: str = ""):
     """
     Get trending hashtags from TikTok's official Trend Discovery platform
     Uses: clockworks/tiktok-trends-scraper
     """
-    client = ApifyClient(settings.apify_api_token)
-    
     run_input = {
           "adsTimeRange": "30",
          "resultsPerPage": 100,
@@ -210,11 +250,8 @@ def get_tiktok_trending_hashtags(country: str = "US", industry: str = ""):
         run_input["industries"] = [industry]
     
     try:
-        run = client.actor("clockworks/tiktok-trends-scraper").call(run_input=run_input)
-        
-        trends = []
-        for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-            trends.append(item)
+        trends = await run_actor("clockworks/tiktok-trends-scraper", run_input)
+        for item in trends:
             print(item)
         print(f"Found {len(trends)} TikTok trending hashtags")
         return trends
@@ -223,13 +260,11 @@ def get_tiktok_trending_hashtags(country: str = "US", industry: str = ""):
         return []
 
 
-def search_tiktok_hashtag_posts(hashtag: str, limit: int = 50):
+async def search_tiktok_hashtag_posts(hashtag: str, limit: int = 50):
     """
     Search TikTok posts by hashtag with engagement metrics
     Uses: powerai/tiktok-hashtag-search-scraper
     """
-    client = ApifyClient(settings.apify_api_token)
-    
     # Remove # if present
     hashtag_clean = hashtag.strip('#')
     
@@ -239,11 +274,7 @@ def search_tiktok_hashtag_posts(hashtag: str, limit: int = 50):
     }
     
     try:
-        run = client.actor("powerai/tiktok-hashtag-search-scraper").call(run_input=run_input)
-        
-        posts = []
-        for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-            posts.append(item)
+        posts = await run_actor("powerai/tiktok-hashtag-search-scraper", run_input)
         
         print(f"Found {len(posts)} TikTok posts for #{hashtag_clean}")
         return posts
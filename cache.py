@@ -0,0 +1,348 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, Counter
+from typing import Any, Dict, Optional
+
+
+class MemoryLRUCache:
+    """
+    In-memory LRU cache of bytes values with per-entry TTL.
+    Evicts least recently used entries once the total stored bytes exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if len(value) > self.max_bytes:
+            return
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value)
+            self.size_bytes += len(value)
+            while self.size_bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    async def aset(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.set(key, value, ttl)
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self.size_bytes -= len(value)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache of bytes values backed by a single SQLite file.
+    Entries carry a TTL; once the total stored bytes exceed max_bytes the least
+    recently accessed entries are evicted.
+
+    Calls block on disk I/O; from async code go through aget/aset (a worker thread).
+    The byte total is kept in memory (counted once at open), expired rows are
+    purged at most every purge_interval seconds, and access times from reads
+    are buffered and written in batches.
+    """
+
+    # Buffered accessed_at updates written once this many reads have piled up
+    TOUCH_BATCH = 256
+
+    def __init__(self, path: str, max_bytes: int, purge_interval: float = 300.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.purge_interval = purge_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        self._lock = threading.Lock()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        self._touched: Dict[str, float] = {}
+        self._purged_at = 0.0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, size FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, size = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._size -= size
+                self._touched.pop(key, None)
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._flush_touches()
+            return bytes(value)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), expires_at, now),
+                )
+                self._size += len(value) - (row[0] if row else 0)
+                self._touched.pop(key, None)
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+                raise
+
+    def delete(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._size -= row[0]
+            self._touched.pop(key, None)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def _flush_touches(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE cache SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self, now: float):
+        if now - self._purged_at >= self.purge_interval:
+            self._purged_at = now
+            freed = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).fetchone()[0]
+            if freed:
+                self._conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+                self._size -= freed
+        if self._size <= self.max_bytes:
+            return
+        # Drop least recently accessed entries until we are back under budget
+        self._flush_touches()
+        to_delete = []
+        for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            to_delete.append((key,))
+            self._size -= size
+            if self._size <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM cache WHERE key = ?", to_delete)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class TieredCache:
+    """
+    Memory LRU in front of an optional disk tier.
+    Reads fall through to disk and promote hits into memory; writes go to both.
+    """
+
+    def __init__(self, memory: MemoryLRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        """get for async code: memory hits stay on the loop, the disk tier is read in a worker thread"""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await self.disk.aget(key)
+            if value is not None:
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def aset(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """set for async code: the disk tier is written in a worker thread"""
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            await self.disk.aset(key, value, ttl)
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size_bytes,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_bytes": self.disk.size_bytes if self.disk is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def build_cache_backend(kind: str, path: str, max_bytes: int):
+    """
+    Build a cache backend from settings: "memory", "sqlite" or "none".
+    """
+    if kind == "memory":
+        return MemoryLRUCache(max_bytes)
+    if kind == "sqlite":
+        return SQLiteCache(path, max_bytes)
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown cache backend: {kind}")
+
+
+def canonical_json(value: Any) -> str:
+    """
+    Canonical JSON form of a value: sorted keys, no insignificant whitespace,
+    None-valued keys dropped and strings stripped, so equivalent inputs share a key.
+    """
+    def _normalize(v):
+        if isinstance(v, dict):
+            return {k: _normalize(item) for k, item in v.items() if item is not None}
+        if isinstance(v, (list, tuple)):
+            return [_normalize(item) for item in v]
+        if isinstance(v, str):
+            return v.strip()
+        return v
+
+    return json.dumps(_normalize(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+class ActorCache:
+    """
+    Cache of Apify actor results keyed by actor id + canonical run_input.
+    Values are stored as JSON bytes, so every hit returns fresh objects that
+    callers are free to mutate.
+    """
+
+    def __init__(self, backend, ttls: Dict[str, int], default_ttl: int):
+        self.backend = backend
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.hits = Counter()
+        self.misses = Counter()
+
+    @staticmethod
+    def make_key(actor_id: str, run_input: dict) -> str:
+        digest = hashlib.sha256(canonical_json(run_input).encode("utf-8")).hexdigest()
+        return f"actor:{actor_id}:{digest}"
+
+    def ttl_for(self, actor_id: str) -> int:
+        return self.ttls.get(actor_id, self.default_ttl)
+
+    def get(self, actor_id: str, run_input: dict) -> Optional[list]:
+        if self.backend is None:
+            return None
+        value = self.backend.get(self.make_key(actor_id, run_input))
+        if value is None:
+            self.misses[actor_id] += 1
+            return None
+        self.hits[actor_id] += 1
+        return json.loads(value)
+
+    def set(self, actor_id: str, run_input: dict, items: list, ttl: Optional[int] = None):
+        if self.backend is None:
+            return
+        value = json.dumps(items, ensure_ascii=False, default=str).encode("utf-8")
+        self.backend.set(self.make_key(actor_id, run_input), value, ttl or self.ttl_for(actor_id))
+
+    async def aget(self, actor_id: str, run_input: dict) -> Optional[list]:
+        """get in a worker thread: disk reads and decoding large results stay off the event loop"""
+        return await asyncio.to_thread(self.get, actor_id, run_input)
+
+    async def aset(self, actor_id: str, run_input: dict, items: list, ttl: Optional[int] = None):
+        await asyncio.to_thread(self.set, actor_id, run_input, items, ttl)
+
+    def stats(self) -> dict:
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "size_bytes": self.backend.size_bytes if self.backend is not None else 0,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "by_actor": {
+                actor_id: {"hits": self.hits[actor_id], "misses": self.misses[actor_id]}
+                for actor_id in set(self.hits) | set(self.misses)
+            },
+        }
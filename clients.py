@@ -0,0 +1,134 @@
+import asyncio
+import httpx
+from apify_client import ApifyClientAsync
+from openai import AsyncOpenAI
+from config import settings
+
+
+# Long-lived clients shared across requests. The FastAPI lifespan in api.py
+# creates them with init_clients() and closes them with close_clients();
+# the getters below create them lazily for scripts that run without the app.
+_http_client: httpx.AsyncClient = None
+_apify_client: ApifyClientAsync = None
+_openai_client: AsyncOpenAI = None
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    """
+    Pooled HTTP/2 client for CDN and media downloads (images, videos).
+    Per-request timeouts and headers are passed at call sites.
+    """
+    return httpx.AsyncClient(
+        http2=settings.http2,
+        limits=_pool_limits(),
+        timeout=settings.http_timeout,
+        follow_redirects=True,
+    )
+
+
+def _build_apify_client() -> ApifyClientAsync:
+    """
+    Async Apify client whose underlying httpx client is swapped for a pooled
+    HTTP/2 one. apify-client builds its own AsyncClient with default limits and
+    no HTTP/2, so we keep its headers and replace the transport settings.
+    """
+    apify = ApifyClientAsync(
+        settings.apify_api_token,
+        max_retries=settings.apify_max_retries,
+        timeout_secs=settings.apify_timeout_secs,
+    )
+    internal = apify.http_client
+    internal.httpx_async_client = httpx.AsyncClient(
+        headers=internal.httpx_async_client.headers,
+        http2=settings.http2,
+        limits=_pool_limits(),
+        timeout=settings.apify_timeout_secs,
+        follow_redirects=True,
+    )
+    return apify
+
+
+def _build_openai_client() -> AsyncOpenAI:
+    # Retries are handled by llm_governor, which also paces them against the rate limits
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            http2=settings.http2,
+            limits=_pool_limits(),
+            timeout=httpx.Timeout(settings.openai_timeout, connect=10.0),
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = _build_http_client()
+    return _http_client
+
+
+def get_apify_client() -> ApifyClientAsync:
+    global _apify_client
+    if _apify_client is None:
+        _apify_client = _build_apify_client()
+    return _apify_client
+
+
+def get_openai_client() -> AsyncOpenAI:
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = _build_openai_client()
+    return _openai_client
+
+
+async def warm_up_clients():
+    """
+    Open the first connections (DNS, TLS, HTTP/2 negotiation) at startup so the
+    first real request doesn't pay for them. Failures are logged and ignored.
+    """
+    async def _warm(name, coro):
+        try:
+            await coro
+            print(f"🔥 Warmed up {name} client")
+        except Exception as e:
+            print(f"⚠️  Warm-up failed for {name}: {e}")
+
+    tasks = [
+        _warm("http", get_http_client().head("https://www.instagram.com/")),
+        _warm("openai", get_openai_client().models.list()),
+    ]
+    if settings.apify_api_token:
+        tasks.append(_warm("apify", get_apify_client().user().get()))
+    await asyncio.gather(*tasks)
+
+
+async def init_clients():
+    """Create the shared clients and optionally warm them up."""
+    get_http_client()
+    get_apify_client()
+    get_openai_client()
+    if settings.warm_up_clients:
+        await warm_up_clients()
+
+
+async def close_clients():
+    """Close the shared clients and drop their connection pools."""
+    global _http_client, _apify_client, _openai_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    if _apify_client is not None:
+        await _apify_client.http_client.httpx_async_client.aclose()
+    if _openai_client is not None:
+        await _openai_client.close()
+    _http_client = None
+    _apify_client = None
+    _openai_client = None
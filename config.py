@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # OpenAI Configuration
@@ -9,6 +9,145 @@ class Settings(BaseSettings):
     # Apify Configuration
     apify_api_token: Optional[str] = None
     
+    # HTTP Client Pool Settings (shared clients owned by the API lifespan)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_timeout: float = 10.0
+    http2: bool = True
+    apify_timeout_secs: int = 360
+    apify_max_retries: int = 8
+    openai_timeout: float = 600.0
+    warm_up_clients: bool = True
+    
+    # OpenAI Rate Governor (per-model RPM/TPM buckets; 0 = unlimited; retries replace the SDK's own)
+    openai_default_rpm: int = 500
+    openai_default_tpm: int = 200_000
+    openai_model_limits: Dict[str, Dict[str, int]] = {
+        "gpt-4o-mini": {"rpm": 500, "tpm": 200_000},
+        "gpt-4o-transcribe": {"rpm": 500, "tpm": 0},
+    }
+    openai_max_retries: int = 5
+    openai_backoff_base_secs: float = 1.0
+    openai_backoff_max_secs: float = 30.0
+    
+    # LLM Usage Accounting (/metrics/llm; prices in USD per 1M tokens)
+    openai_pricing: Dict[str, Dict[str, float]] = {
+        "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+        "gpt-4o-transcribe": {"input": 2.50, "audio_input": 6.00, "output": 10.00},
+    }
+    llm_metrics_max_calls: int = 1000
+    llm_metrics_max_requests: int = 500
+    
+    # Apify Actor Result Cache ("memory", "sqlite" or "none")
+    actor_cache_backend: str = "memory"
+    actor_cache_path: str = ".cache/actor_cache.sqlite3"
+    actor_cache_max_bytes: int = 256 * 1024 * 1024
+    actor_cache_default_ttl: int = 15 * 60
+    actor_cache_ttls: Dict[str, int] = {
+        "apify/instagram-hashtag-scraper": 15 * 60,
+        "apify/instagram-scraper": 15 * 60,
+        "apimaestro/linkedin-posts-search-scraper-no-cookies": 15 * 60,
+        "danek/twitter-scraper-ppr": 10 * 60,
+        "clockworks/tiktok-trends-scraper": 24 * 60 * 60,
+        "powerai/tiktok-hashtag-search-scraper": 60 * 60,
+    }
+    profile_cache_ttl: int = 6 * 60 * 60
+    
+    # Creator Profile Store ("memory", "sqlite" or "none")
+    profile_store_backend: str = "sqlite"
+    profile_store_path: str = ".cache/profiles.sqlite3"
+    profile_store_max_bytes: int = 512 * 1024 * 1024
+    profile_store_ttl: int = 24 * 60 * 60
+    profile_miss_ttl: int = 60 * 60  # usernames the scraper returned nothing for; 0 disables
+    
+    # Profile Scraping (chunked, bounded-parallel actor runs)
+    profile_chunk_size: int = 25
+    profile_scrape_concurrency: int = 4
+    profile_chunk_timeout_secs: int = 180
+    
+    # Niche Post Fetching (platform x keyword fan-out in fetch_niche_posts)
+    niche_fetch_concurrency: int = 8
+    niche_platform_concurrency: Dict[str, int] = {
+        "instagram": 4,
+        "linkedin": 3,
+        "twitter": 3,
+    }
+    niche_fetch_timeout_secs: float = 300.0
+    niche_fetch_abort_grace_secs: float = 30.0  # extra time to read partial results and abort the run
+    
+    # Conversation Clustering (one completion up to shard size, map-reduce above it)
+    conversation_max_posts: int = 2000
+    conversation_shard_size: int = 100
+    conversation_map_concurrency: int = 8
+    
+    # Comment Generation Images
+    comment_max_images: int = 4
+    image_fetch_concurrency: int = 4
+    image_max_bytes: int = 8 * 1024 * 1024
+    comment_llm_budget: int = 12  # posts per /actions request that get an LLM comment
+    comment_min_engagement_score: int = 1  # posts with no likes, comment ratio or recency score 0
+    comment_recent_hours: int = 48
+    comment_batch_concurrency: int = 6
+    comment_batch_max_posts: int = 100
+    vision_low_max_side: int = 512
+    vision_high_max_side: int = 1024
+    vision_jpeg_quality: int = 80
+    vision_rich_caption_chars: int = 600
+    vision_short_caption_chars: int = 80
+    # Input tokens billed per image: "base" per image, plus "tile" per 512px tile at high detail
+    vision_image_tokens: Dict[str, Dict[str, int]] = {
+        "gpt-4o": {"base": 85, "tile": 170},
+        "gpt-4o-mini": {"base": 2833, "tile": 5667},
+    }
+    
+    # Processed Image Cache (memory LRU, plus a disk tier when a path is set)
+    image_cache_max_bytes: int = 64 * 1024 * 1024
+    image_cache_disk_path: Optional[str] = None
+    image_cache_disk_max_bytes: int = 512 * 1024 * 1024
+    image_cache_ttl: int = 24 * 60 * 60
+    
+    # Image Proxy Cache (memory LRU, plus a disk tier when a path is set)
+    proxy_cache_max_bytes: int = 128 * 1024 * 1024
+    proxy_cache_disk_path: Optional[str] = ".cache/proxy_images.sqlite3"
+    proxy_cache_disk_max_bytes: int = 1024 * 1024 * 1024
+    proxy_cache_max_item_bytes: int = 5 * 1024 * 1024
+    proxy_cache_ttl: int = 24 * 60 * 60
+    proxy_inflight_wait_secs: float = 15.0
+    
+    # Image Proxy Variants (resized WebP/AVIF/JPEG, cached on disk)
+    proxy_variant_widths: List[int] = [48, 96, 192, 384, 768]
+    proxy_variant_quality: int = 75
+    proxy_variant_cache_max_bytes: int = 32 * 1024 * 1024
+    proxy_variant_disk_path: Optional[str] = ".cache/proxy_variants.sqlite3"
+    proxy_variant_disk_max_bytes: int = 512 * 1024 * 1024
+    proxy_resize_workers: int = 2
+    
+    # Media Uploads/Downloads (spooled to disk above media_spool_max_memory)
+    media_max_bytes: int = 500 * 1024 * 1024
+    media_spool_max_memory: int = 8 * 1024 * 1024
+    media_chunk_size: int = 1024 * 1024
+    media_download_timeout_secs: float = 120.0
+    
+    # Transcription (ffmpeg audio extraction, split at silences, concurrent segments)
+    transcriber: str = "openai"  # "openai" or "fake" (offline stand-in, no API calls)
+    transcribe_segmented: bool = True
+    ffmpeg_path: str = "ffmpeg"
+    transcribe_audio_sample_rate: int = 16000
+    transcribe_audio_bitrate: str = "32k"
+    transcribe_segment_target_secs: float = 300.0
+    transcribe_segment_max_secs: float = 600.0
+    transcribe_silence_noise_db: float = -35.0
+    transcribe_silence_min_secs: float = 0.5
+    transcribe_concurrency: int = 4
+    
+    # Transcript/Brief Cache (transcripts keyed by media SHA-256, briefs by normalized text hash)
+    analysis_cache_backend: str = "sqlite"  # "sqlite", "memory" or "none"
+    analysis_cache_path: str = ".cache/analysis.sqlite3"
+    analysis_cache_max_bytes: int = 128 * 1024 * 1024
+    transcript_cache_ttl: int = 30 * 24 * 60 * 60
+    brief_cache_ttl: int = 7 * 24 * 60 * 60
+    
     # Application Settings
     app_name: str = "Social Media Promotion API"
     app_version: str = "1.0.0"
@@ -0,0 +1,108 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# (lower bound, score) bands, checked top to bottom
+ENGAGEMENT_BANDS = [(6, 35), (3, 28), (1.5, 20), (0.5, 10)]
+ENGAGEMENT_FLOOR = 3
+FF_RATIO_BANDS = [(10, 25), (5, 20), (2, 15), (1, 10)]
+FF_RATIO_FLOOR = 5
+ACTIVITY_BANDS = [(200, 20), (100, 16), (50, 12), (20, 8)]
+ACTIVITY_FLOOR = 4
+
+
+def _banded(values: np.ndarray, bands, floor) -> np.ndarray:
+    return np.select([values >= bound for bound, _ in bands], [score for _, score in bands], default=floor)
+
+
+def _size_scores(followers: np.ndarray) -> np.ndarray:
+    return np.select(
+        [
+            (followers >= 5000) & (followers <= 50000),    # Prime emerging range
+            (followers >= 1000) & (followers < 5000),      # Micro-influencer, high potential
+            (followers > 50000) & (followers <= 100000),   # Still emerging
+            (followers >= 500) & (followers < 1000),       # Very early stage
+            (followers > 100000) & (followers <= 500000),  # Established but not mega
+        ],
+        [20, 18, 15, 12, 8],
+        default=3,  # Either too small or already big
+    )
+
+
+def _top_k_indices(scores: np.ndarray, top_k: Optional[int]) -> np.ndarray:
+    """
+    Indices of the top_k highest scores, highest first, ties kept in input order
+    (the same result as a stable descending sort cut to top_k, without sorting everything).
+    """
+    if top_k is None or top_k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    threshold = -np.partition(-scores, top_k - 1)[top_k - 1]
+    candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.argsort(-scores[candidates], kind='stable')][:top_k]
+
+
+def score_creators(profiles: List[Dict], posts: List[Dict], top_k: Optional[int] = None) -> List[Dict]:
+    """
+    Emergence/growth potential score for each creator (higher = likely to grow
+    or go viral soon), from engagement rate, follower-to-following ratio,
+    posting activity and follower count.
+    Groups posts by ownerUsername once, scores every profile with NumPy arrays,
+    and returns the top_k profiles (all when None) enriched with their score data,
+    highest emergence_score first.
+    """
+    if not profiles:
+        return []
+
+    # Per-owner likes/comments/post counts in a single pass over posts
+    owner_stats: Dict[Optional[str], List[int]] = {}
+    for post in posts:
+        stats = owner_stats.setdefault(post.get('ownerUsername'), [0, 0, 0])
+        stats[0] += post.get('likesCount', 0) or 0
+        stats[1] += post.get('commentsCount', 0) or 0
+        stats[2] += 1
+
+    n = len(profiles)
+    followers = np.empty(n, dtype=np.float64)
+    following = np.empty(n, dtype=np.float64)
+    posts_count = np.empty(n, dtype=np.float64)
+    total_likes = np.empty(n, dtype=np.float64)
+    total_comments = np.empty(n, dtype=np.float64)
+    sample_size = np.empty(n, dtype=np.float64)
+
+    for i, profile in enumerate(profiles):
+        likes, comments, count = owner_stats.get(profile.get('username'), (0, 0, 0))
+        followers[i] = profile.get('followersCount', 0) or 0
+        following[i] = profile.get('followsCount', 1) or 0
+        posts_count[i] = profile.get('postsCount', 0) or 0
+        total_likes[i] = likes
+        total_comments[i] = comments
+        sample_size[i] = count or 1
+
+    avg_likes = total_likes / sample_size
+    avg_comments = total_comments / sample_size
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        engagement_rate = np.where(followers > 0, ((avg_likes + avg_comments) / followers) * 100, 0.0)
+    ff_ratio = followers / np.maximum(following, 1)
+
+    emergence_score = (
+        _banded(engagement_rate, ENGAGEMENT_BANDS, ENGAGEMENT_FLOOR)
+        + _banded(ff_ratio, FF_RATIO_BANDS, FF_RATIO_FLOOR)
+        + _size_scores(followers)
+        + _banded(posts_count, ACTIVITY_BANDS, ACTIVITY_FLOOR)
+    )
+
+    creators = []
+    for i in _top_k_indices(emergence_score, top_k):
+        creators.append({
+            **profiles[i],
+            "emergence_score": int(emergence_score[i]),
+            "engagement_rate": round(float(engagement_rate[i]), 2),
+            "ff_ratio": round(float(ff_ratio[i]), 2),
+            "avg_likes": round(float(avg_likes[i]), 1),
+            "avg_comments": round(float(avg_comments[i]), 1),
+        })
+    return creators
@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+from cache import MemoryLRUCache, SQLiteCache, TieredCache
+from clients import get_http_client
+from config import settings
+from images import VARIANT_FORMATS, encode_variant, supported_variant_format
+from singleflight import SingleFlight
+
+
+UPSTREAM_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+    "Referer": "https://www.instagram.com/",
+}
+
+BROWSER_CACHE_CONTROL = "public, max-age=3600"
+
+# Proxied images (metadata + body) keyed by upstream URL
+proxy_cache = TieredCache(
+    MemoryLRUCache(settings.proxy_cache_max_bytes),
+    SQLiteCache(settings.proxy_cache_disk_path, settings.proxy_cache_disk_max_bytes)
+    if settings.proxy_cache_disk_path else None,
+)
+
+# Resized/re-encoded variants keyed by URL, width and format
+variant_cache = TieredCache(
+    MemoryLRUCache(settings.proxy_variant_cache_max_bytes),
+    SQLiteCache(settings.proxy_variant_disk_path, settings.proxy_variant_disk_max_bytes)
+    if settings.proxy_variant_disk_path else None,
+)
+variant_flights = SingleFlight()
+
+# Resizing gets its own small pool so it neither blocks the event loop nor starves to_thread work
+_resize_pool = ThreadPoolExecutor(max_workers=settings.proxy_resize_workers, thread_name_prefix="proxy-resize")
+
+
+def close_image_proxy():
+    """Stop the resize workers; called on app shutdown"""
+    _resize_pool.shutdown(cancel_futures=True)
+
+
+# Upstream fetches in progress; concurrent requests for the same URL wait on these
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+class CachedImage:
+    __slots__ = ("content_type", "etag", "last_modified", "body")
+
+    def __init__(self, content_type: str, etag: str, last_modified: str, body: bytes):
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+
+    def to_bytes(self) -> bytes:
+        meta = {"content_type": self.content_type, "etag": self.etag, "last_modified": self.last_modified}
+        return json.dumps(meta).encode("utf-8") + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, value: bytes) -> "CachedImage":
+        meta, body = value.split(b"\n", 1)
+        meta = json.loads(meta)
+        return cls(meta["content_type"], meta["etag"], meta["last_modified"], body)
+
+
+async def _get_cached(url: str) -> Optional[CachedImage]:
+    """Cached original for url; a miss in memory reads the disk tier in a worker thread"""
+    value = await proxy_cache.aget(f"proxy:{url}")
+    return CachedImage.from_bytes(value) if value is not None else None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+
+def _not_modified(image: CachedImage, request_headers) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against a cached image"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        return bool(image.etag) and _etag_matches(if_none_match, image.etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and image.last_modified:
+        try:
+            return parsedate_to_datetime(image.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _cached_response(image: CachedImage, request_headers, extra_headers: Optional[Dict[str, str]] = None) -> Response:
+    headers = {
+        "Cache-Control": BROWSER_CACHE_CONTROL,
+        "Access-Control-Allow-Origin": "*",
+        "ETag": image.etag,
+        "Last-Modified": image.last_modified,
+        **(extra_headers or {}),
+    }
+    if _not_modified(image, request_headers):
+        return Response(status_code=304, headers=headers)
+    return Response(content=image.body, headers={**headers, "Content-Type": image.content_type})
+
+
+async def proxy_image_response(url: str, request_headers, width: Optional[int] = None, fmt: Optional[str] = None) -> Response:
+    """
+    Serve an allowed CDN image, from proxy_cache when possible.
+
+    On a miss the upstream body is streamed straight to the client while being
+    collected for the cache; concurrent requests for the same URL wait for that
+    fetch instead of starting their own. Cached responses carry ETag and
+    Last-Modified and honour If-None-Match / If-Modified-Since with a 304.
+
+    With a width and/or format the image is served as a resized variant instead
+    (see variant_response). A width above every variant width alone gets the
+    original, unchanged.
+    """
+    width = _snap_width(width)
+    if width is not None or fmt is not None:
+        return await variant_response(url, request_headers, width, fmt)
+
+    image = await _get_cached(url)
+    if image is not None:
+        return _cached_response(image, request_headers)
+
+    inflight = _inflight.get(url)
+    if inflight is not None:
+        try:
+            image = await asyncio.wait_for(asyncio.shield(inflight), timeout=settings.proxy_inflight_wait_secs)
+        except Exception:
+            image = None
+        if image is not None:
+            return _cached_response(image, request_headers)
+        # The other fetch failed, stalled or was too large to share; fetch it ourselves
+
+    # Later requests for this URL wait on this future instead of fetching again
+    future = asyncio.get_running_loop().create_future()
+    _inflight[url] = future
+    return await _stream_from_upstream(url, future)
+
+
+def _resolve(url: str, future: asyncio.Future, image: Optional[CachedImage] = None, error: Optional[Exception] = None):
+    if not future.done():
+        if error is not None:
+            future.set_exception(error)
+            # Nobody may be waiting; don't let an unretrieved exception get logged
+            future.exception()
+        else:
+            future.set_result(image)
+    if _inflight.get(url) is future:
+        del _inflight[url]
+
+
+async def _stream_from_upstream(url: str, future: asyncio.Future) -> Response:
+    client = get_http_client()
+    try:
+        upstream = await client.send(
+            client.build_request("GET", url, headers=UPSTREAM_HEADERS, timeout=10.0),
+            stream=True,
+        )
+    except BaseException as exc:
+        _resolve(url, future, error=RuntimeError(f"Upstream error: {exc}"))
+        if isinstance(exc, httpx.RequestError):
+            raise HTTPException(status_code=502, detail=f"Upstream error: {exc}")
+        raise
+
+    if upstream.status_code != 200:
+        await upstream.aclose()
+        _resolve(url, future, error=RuntimeError(f"Upstream status {upstream.status_code}"))
+        raise HTTPException(status_code=upstream.status_code, detail="Failed to fetch image")
+
+    content_type = upstream.headers.get("Content-Type", "image/jpeg")
+    last_modified = upstream.headers.get("Last-Modified") or formatdate(time.time(), usegmt=True)
+    upstream_etag = upstream.headers.get("ETag")
+
+    async def finish(image=None, error=None):
+        await upstream.aclose()
+        _resolve(url, future, image, error)
+
+    async def body():
+        chunks = []
+        size = 0
+        max_item_bytes = settings.proxy_cache_max_item_bytes
+        try:
+            async for chunk in upstream.aiter_bytes():
+                if chunks is not None:
+                    size += len(chunk)
+                    if size > max_item_bytes:
+                        chunks = None  # too large to cache; keep streaming
+                    else:
+                        chunks.append(chunk)
+                yield chunk
+        except BaseException as exc:
+            await finish(error=exc if isinstance(exc, Exception) else RuntimeError("fetch aborted"))
+            raise
+
+        image = None
+        if chunks is not None:
+            content = b"".join(chunks)
+            etag = upstream_etag or f'"{hashlib.sha1(content).hexdigest()}"'
+            image = CachedImage(content_type, etag, last_modified, content)
+            # Lands in memory at once; the disk write happens in a worker thread
+            await proxy_cache.aset(f"proxy:{url}", image.to_bytes(), settings.proxy_cache_ttl)
+        await finish(image)
+
+    headers = {
+        "Cache-Control": BROWSER_CACHE_CONTROL,
+        "Access-Control-Allow-Origin": "*",
+        "Last-Modified": last_modified,
+    }
+    if upstream_etag:
+        headers["ETag"] = upstream_etag
+    if upstream.headers.get("Content-Length") and not upstream.headers.get("Content-Encoding"):
+        headers["Content-Length"] = upstream.headers["Content-Length"]
+
+    # finish() also runs after the response, covering clients that disconnect before the body starts
+    return StreamingResponse(
+        body(),
+        media_type=content_type,
+        headers=headers,
+        background=BackgroundTask(finish, error=RuntimeError("response not completed")),
+    )
+
+
+def _snap_width(width: Optional[int]) -> Optional[int]:
+    """
+    Round a requested width up to the nearest configured variant width, bounding cache entries per URL.
+    Widths above the largest one get None: the image at its original size.
+    """
+    if width is None:
+        return None
+    return next((w for w in sorted(settings.proxy_variant_widths) if w >= width), None)
+
+
+def _negotiate_format(fmt: Optional[str], accept: str) -> str:
+    """Explicit format if given, else the best one the browser's Accept header allows"""
+    if fmt is not None:
+        fmt = fmt.lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in VARIANT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    elif "image/avif" in accept:
+        fmt = "avif"
+    elif "image/webp" in accept:
+        fmt = "webp"
+    else:
+        fmt = "jpeg"
+    return supported_variant_format(fmt)
+
+
+async def variant_response(url: str, request_headers, width: Optional[int], fmt: Optional[str]) -> Response:
+    """
+    Serve url resized to at most width pixels wide (a variant width, see
+    _snap_width; None keeps the original size) and encoded as fmt
+    (avif/webp/jpeg; picked from the Accept header when omitted, AVIF falling
+    back to WebP where Pillow can't encode it). Variants are built once per
+    (url, snapped width, format) from the cached original and kept in
+    variant_cache, on disk.
+    """
+    fmt_requested = fmt is not None
+    fmt = _negotiate_format(fmt, request_headers.get("accept", ""))
+    extra_headers = None if fmt_requested else {"Vary": "Accept"}
+
+    key = f"variant:{url}:{width or 'orig'}:{fmt}"
+    value = await variant_cache.aget(key)
+    if value is not None:
+        return _cached_response(CachedImage.from_bytes(value), request_headers, extra_headers)
+
+    image, _ = await variant_flights.do(key, _build_variant, key, url, width, fmt)
+    return _cached_response(image, request_headers, extra_headers)
+
+
+async def _build_variant(key: str, url: str, width: Optional[int], fmt: str) -> CachedImage:
+    original = await _load_original(url)
+    loop = asyncio.get_running_loop()
+    try:
+        body, content_type = await loop.run_in_executor(
+            _resize_pool, encode_variant, original.body, width, fmt, settings.proxy_variant_quality
+        )
+    except OSError as exc:
+        raise HTTPException(status_code=415, detail=f"Could not decode image: {exc}")
+
+    image = CachedImage(content_type, f'"{hashlib.sha1(body).hexdigest()}"', original.last_modified, body)
+    await variant_cache.aset(key, image.to_bytes(), settings.proxy_cache_ttl)
+    print(f"🖼️ Built {fmt} variant ({width or 'original'}px): {len(original.body)} -> {len(body)} bytes")
+    return image
+
+
+async def _load_original(url: str) -> CachedImage:
+    """Full original image for url: cached, from a fetch already in flight, or downloaded now"""
+    image = await _get_cached(url)
+    if image is not None:
+        return image
+
+    inflight = _inflight.get(url)
+    if inflight is not None:
+        try:
+            image = await asyncio.wait_for(asyncio.shield(inflight), timeout=settings.proxy_inflight_wait_secs)
+        except Exception:
+            image = None
+        if image is not None:
+            return image
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[url] = future
+    try:
+        image = await _download_original(url)
+    except BaseException as exc:
+        _resolve(url, future, error=exc if isinstance(exc, Exception) else RuntimeError("fetch aborted"))
+        raise
+    _resolve(url, future, image)
+    return image
+
+
+async def _download_original(url: str) -> CachedImage:
+    client = get_http_client()
+    max_bytes = settings.image_max_bytes
+    try:
+        async with client.stream("GET", url, headers=UPSTREAM_HEADERS, timeout=10.0) as upstream:
+            if upstream.status_code != 200:
+                raise HTTPException(status_code=upstream.status_code, detail="Failed to fetch image")
+            chunks = []
+            size = 0
+            async for chunk in upstream.aiter_bytes():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=502, detail=f"Upstream image too large (> {max_bytes} bytes)")
+                chunks.append(chunk)
+            content_type = upstream.headers.get("Content-Type", "image/jpeg")
+            last_modified = upstream.headers.get("Last-Modified") or formatdate(time.time(), usegmt=True)
+            upstream_etag = upstream.headers.get("ETag")
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=502, detail=f"Upstream error: {exc}")
+
+    content = b"".join(chunks)
+    image = CachedImage(content_type, upstream_etag or f'"{hashlib.sha1(content).hexdigest()}"', last_modified, content)
+    if len(content) <= settings.proxy_cache_max_item_bytes:
+        await proxy_cache.aset(f"proxy:{url}", image.to_bytes(), settings.proxy_cache_ttl)
+    return image
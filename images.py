@@ -0,0 +1,101 @@
+import io
+import math
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps, features
+
+from config import settings
+
+
+# OpenAI vision pricing: every image costs a base amount, "high" detail adds
+# a fixed amount per 512px tile after the image is scaled to fit 2048x2048
+# and then to 768px on its shortest side. Both amounts depend on the model
+# (settings.vision_image_tokens); these gpt-4o rates cover models not listed there.
+LOW_DETAIL_TOKENS = 85
+TOKENS_PER_TILE = 170
+
+
+def downscale_image(content: bytes, max_side: int, quality: int = 80) -> Tuple[bytes, int, int]:
+    """
+    Resize an image so its longest side is at most max_side and re-encode it as JPEG.
+    Returns (jpeg bytes, width, height). CPU-bound; run it in a worker thread.
+    """
+    with Image.open(io.BytesIO(content)) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue(), img.width, img.height
+
+
+# Output formats for resized variants: Pillow format name and Content-Type
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+
+def supported_variant_format(fmt: str) -> str:
+    """fmt if this Pillow build can encode it, falling back from AVIF to WebP to JPEG"""
+    if fmt == "avif" and not features.check("avif"):
+        fmt = "webp"
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "jpeg"
+    return fmt
+
+
+def encode_variant(content: bytes, width: Optional[int], fmt: str, quality: int = 75) -> Tuple[bytes, str]:
+    """
+    Resize an image to at most width pixels wide (never upscaling; None keeps the
+    original size) and encode it as fmt ("avif", "webp" or "jpeg").
+    Returns (encoded bytes, content type).
+    CPU-bound; run it in a worker pool.
+    """
+    pil_format, content_type = VARIANT_FORMATS[fmt]
+    with Image.open(io.BytesIO(content)) as img:
+        img = ImageOps.exif_transpose(img)
+        if fmt == "jpeg" and img.mode != "RGB":
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        if width and img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format=pil_format, quality=quality)
+        return out.getvalue(), content_type
+
+
+def estimate_image_tokens(width: Optional[int], height: Optional[int], detail: str, model: str) -> int:
+    """Estimated input tokens for one image sent to model at the given vision detail level"""
+    rates = settings.vision_image_tokens.get(model, {})
+    base_tokens = rates.get("base", LOW_DETAIL_TOKENS)
+    tile_tokens = rates.get("tile", TOKENS_PER_TILE)
+    if detail == "low" or not width or not height:
+        return base_tokens
+
+    # Fit within 2048x2048, then scale the shortest side down to 768
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+
+    tiles = math.ceil(width / 512) * math.ceil(height / 512)
+    return base_tokens + tile_tokens * tiles
+
+
+def choose_vision_detail(caption: str, image_count: int, rich_caption_chars: int, short_caption_chars: int) -> Optional[str]:
+    """
+    Pick the vision detail level for a post's images:
+      - None (send no images) when the caption alone is rich enough to comment on
+      - "high" for a single image with little or no caption, where the image is the content
+      - "low" otherwise
+    """
+    caption_length = len((caption or "").strip())
+    if not image_count or caption_length >= rich_caption_chars:
+        return None
+    if image_count == 1 and caption_length < short_caption_chars:
+        return "high"
+    return "low"
@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import openai
+
+from clients import get_openai_client
+from config import settings
+from images import estimate_image_tokens
+from llm_metrics import llm_metrics
+
+
+# Lower value = served first. Interactive endpoints keep the default; batch work
+# (e.g. /generate-comments) sets llm_priority to PRIORITY_BATCH for its tasks.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+llm_priority: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+# Rough tokens per character of English text, as used for estimates before a call
+CHARS_PER_TOKEN = 4
+# Per-message overhead of the chat format
+TOKENS_PER_MESSAGE = 4
+
+# Failures worth another attempt: rate limits, server errors and dropped connections
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class TokenBucket:
+    """
+    Refills continuously at per_minute / 60 per second up to a capacity of per_minute.
+    A per_minute of 0 means unlimited. The level may go negative when a call
+    turns out to cost more than estimated; later callers then wait out the debt.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 when it can be taken now)"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        # Never ask for more than a full bucket, or a large request would wait forever
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float, now: float):
+        if self.capacity:
+            self._refill(now)
+            self.level -= amount
+
+
+class _ModelState:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.waiters: List[Tuple[int, int]] = []
+        self.condition = asyncio.Condition()
+
+
+class OpenAIGovernor:
+    """
+    Process-wide gate in front of every OpenAI call.
+
+    - Each model gets its own requests-per-minute and tokens-per-minute buckets;
+      a call waits until both can cover it (tokens estimated up front, then
+      corrected with the usage the API reports).
+    - Waiting calls are served by priority (llm_priority), then arrival order,
+      so interactive requests overtake queued batch work.
+    - 429s, 5xx and connection errors are retried with jittered exponential
+      backoff (honouring Retry-After); a 429 also pauses the whole model so
+      queued calls don't pile onto the limit.
+    """
+
+    def __init__(
+        self,
+        model_limits: Dict[str, Dict[str, int]],
+        default_rpm: int,
+        default_tpm: int,
+        max_retries: int,
+        backoff_base_secs: float,
+        backoff_max_secs: float,
+    ):
+        self.model_limits = model_limits
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.max_retries = max_retries
+        self.backoff_base_secs = backoff_base_secs
+        self.backoff_max_secs = backoff_max_secs
+        self._models: Dict[str, _ModelState] = {}
+        self._sequence = itertools.count()
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            limits = self.model_limits.get(model, {})
+            state = _ModelState(limits.get("rpm", self.default_rpm), limits.get("tpm", self.default_tpm))
+            self._models[model] = state
+        return state
+
+    async def acquire(self, model: str, tokens: int, priority: Optional[int] = None):
+        """Wait for this call's turn and for room in the model's RPM and TPM buckets, then take it"""
+        state = self._state(model)
+        entry = (llm_priority.get() if priority is None else priority, next(self._sequence))
+
+        async with state.condition:
+            heapq.heappush(state.waiters, entry)
+            # A higher-priority arrival may now be at the head; let the current head re-check
+            state.condition.notify_all()
+            try:
+                while True:
+                    if state.waiters[0] != entry:
+                        await state.condition.wait()
+                        continue
+                    now = time.monotonic()
+                    delay = max(
+                        state.paused_until - now,
+                        state.requests.wait_time(1, now),
+                        state.tokens.wait_time(tokens, now),
+                    )
+                    if delay <= 0:
+                        heapq.heappop(state.waiters)
+                        state.requests.take(1, now)
+                        state.tokens.take(tokens, now)
+                        state.condition.notify_all()
+                        return
+                    try:
+                        await asyncio.wait_for(state.condition.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                # Cancelled while queued: leave the queue without taking capacity
+                if entry in state.waiters:
+                    state.waiters.remove(entry)
+                    heapq.heapify(state.waiters)
+                    state.condition.notify_all()
+                raise
+
+    def record_usage(self, model: str, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Charge (or refund) the difference between the estimate and the reported usage"""
+        if actual_tokens is None:
+            return
+        self._state(model).tokens.take(actual_tokens - estimated_tokens, time.monotonic())
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after", ""))
+            except ValueError:
+                retry_after = None
+        ceiling = min(self.backoff_max_secs, self.backoff_base_secs * (2 ** attempt))
+        delay = random.uniform(ceiling / 2, ceiling)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    async def call(
+        self,
+        model: str,
+        estimated_tokens: int,
+        fn: Callable[[], Awaitable[Any]],
+        kind: str = "chat",
+        images: int = 0,
+    ) -> Any:
+        """
+        Run fn() (one OpenAI request) under the model's limits, retrying
+        retryable failures. fn is called again for each attempt.
+        The outcome (usage, latency, time queued) is recorded in llm_metrics.
+        """
+        queue_secs = 0.0
+        latency_secs = 0.0
+        attempt = 0
+        try:
+            for attempt in range(self.max_retries + 1):
+                queued_at = time.monotonic()
+                await self.acquire(model, estimated_tokens)
+                sent_at = time.monotonic()
+                queue_secs += sent_at - queued_at
+                try:
+                    response = await fn()
+                except Exception as e:
+                    latency_secs = time.monotonic() - sent_at
+                    # A failed request reports no usage; give back the estimate taken for
+                    # this attempt so it isn't charged to the bucket (each retry takes its own)
+                    self.record_usage(model, estimated_tokens, 0)
+                    if not isinstance(e, RETRYABLE_ERRORS) or attempt == self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, e)
+                    if isinstance(e, openai.RateLimitError):
+                        state = self._state(model)
+                        state.paused_until = max(state.paused_until, time.monotonic() + delay)
+                    print(f"⏳ OpenAI {type(e).__name__} on {model}, retrying in {delay:.1f}s "
+                          f"(attempt {attempt + 1}/{self.max_retries})")
+                    await asyncio.sleep(delay)
+                    continue
+                latency_secs = time.monotonic() - sent_at
+
+                usage = getattr(response, "usage", None)
+                self.record_usage(model, estimated_tokens, getattr(usage, "total_tokens", None))
+                llm_metrics.record(
+                    model, kind, response, images=images, latency_secs=latency_secs,
+                    queue_secs=queue_secs, attempts=attempt + 1,
+                )
+                return response
+        except Exception as e:
+            llm_metrics.record(
+                model, kind, images=images, latency_secs=latency_secs,
+                queue_secs=queue_secs, attempts=attempt + 1, error=f"{type(e).__name__}: {e}"[:300],
+            )
+            raise
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        stats = {}
+        for model, state in self._models.items():
+            state.requests._refill(now)
+            state.tokens._refill(now)
+            stats[model] = {
+                "queued": len(state.waiters),
+                "requests_available": int(state.requests.level) if state.requests.capacity else None,
+                "tokens_available": int(state.tokens.level) if state.tokens.capacity else None,
+                "paused_secs": round(max(0.0, state.paused_until - now), 1),
+            }
+        return stats
+
+
+openai_governor = OpenAIGovernor(
+    model_limits=settings.openai_model_limits,
+    default_rpm=settings.openai_default_rpm,
+    default_tpm=settings.openai_default_tpm,
+    max_retries=settings.openai_max_retries,
+    backoff_base_secs=settings.openai_backoff_base_secs,
+    backoff_max_secs=settings.openai_backoff_max_secs,
+)
+
+
+def count_images(messages: List[Dict]) -> int:
+    return sum(
+        1
+        for message in messages if not isinstance(message.get("content") or "", str)
+        for part in message["content"] if part.get("type") == "image_url"
+    )
+
+
+def estimate_chat_tokens(messages: List[Dict], model: str, max_tokens: Optional[int] = None) -> int:
+    """Rough prompt + completion token count for a chat request to model, before sending it"""
+    tokens = max_tokens or 0
+    for message in messages:
+        tokens += TOKENS_PER_MESSAGE
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            tokens += len(content) // CHARS_PER_TOKEN
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                tokens += len(part.get("text", "")) // CHARS_PER_TOKEN
+            elif part.get("type") == "image_url":
+                detail = part.get("image_url", {}).get("detail", "auto")
+                # Images are downscaled to vision_high_max_side before sending, so this is an upper bound
+                side = settings.vision_high_max_side
+                tokens += estimate_image_tokens(side, side, "low" if detail == "low" else "high", model)
+    return tokens
+
+
+async def create_chat_completion(**kwargs):
+    """get_openai_client().chat.completions.create(**kwargs), through the governor"""
+    messages = kwargs["messages"]
+    return await openai_governor.call(
+        kwargs["model"],
+        estimate_chat_tokens(messages, kwargs["model"], kwargs.get("max_tokens")),
+        lambda: get_openai_client().chat.completions.create(**kwargs),
+        kind="chat",
+        images=count_images(messages),
+    )
+
+
+async def parse_chat_completion(**kwargs):
+    """get_openai_client().beta.chat.completions.parse(**kwargs), through the governor"""
+    messages = kwargs["messages"]
+    return await openai_governor.call(
+        kwargs["model"],
+        estimate_chat_tokens(messages, kwargs["model"], kwargs.get("max_tokens")),
+        lambda: get_openai_client().beta.chat.completions.parse(**kwargs),
+        kind="chat",
+        images=count_images(messages),
+    )
+
+
+async def create_transcription(file, **kwargs):
+    """
+    get_openai_client().audio.transcriptions.create(file=file, **kwargs), through the governor.
+    Audio length isn't known up front, so only the model's RPM bucket gates these;
+    the reported usage is still charged to its TPM bucket. file is a (name, fileobj)
+    tuple, rewound before every attempt.
+    """
+    name, fileobj = file
+
+    async def attempt():
+        fileobj.seek(0)
+        return await get_openai_client().audio.transcriptions.create(file=(name, fileobj), **kwargs)
+
+    return await openai_governor.call(kwargs["model"], 0, attempt, kind="transcription")
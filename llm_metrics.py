@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from config import settings
+
+
+# Set per HTTP request by the middleware in api.py; calls made outside a request
+# (scripts, warm-up) are attributed to "-"
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+endpoint_var: ContextVar[str] = ContextVar("endpoint", default="-")
+
+
+def _field(obj: Any, name: str, default=None):
+    """Attribute or dict key; SDK usage objects come back as either depending on the endpoint"""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def usage_tokens(response: Any) -> Dict[str, int]:
+    """
+    Normalize the usage block of a chat completion (prompt/completion tokens) or a
+    transcription (input/output tokens, audio split out) into one shape.
+    """
+    usage = _field(response, "usage")
+    prompt = _field(usage, "prompt_tokens")
+    if prompt is not None:
+        details = _field(usage, "prompt_tokens_details")
+        return {
+            "prompt_tokens": prompt or 0,
+            "cached_tokens": _field(details, "cached_tokens", 0) or 0,
+            "audio_tokens": 0,
+            "completion_tokens": _field(usage, "completion_tokens", 0) or 0,
+        }
+    details = _field(usage, "input_token_details")
+    return {
+        "prompt_tokens": _field(usage, "input_tokens", 0) or 0,
+        "cached_tokens": 0,
+        "audio_tokens": _field(details, "audio_tokens", 0) or 0,
+        "completion_tokens": _field(usage, "output_tokens", 0) or 0,
+    }
+
+
+def estimate_cost(model: str, tokens: Dict[str, int]) -> float:
+    """USD cost from settings.openai_pricing (per 1M tokens); 0 for models without a price"""
+    price = settings.openai_pricing.get(model)
+    if not price:
+        return 0.0
+    audio = tokens["audio_tokens"]
+    cached = tokens["cached_tokens"]
+    text = tokens["prompt_tokens"] - audio - cached
+    cost = (
+        text * price.get("input", 0)
+        + cached * price.get("cached_input", price.get("input", 0))
+        + audio * price.get("audio_input", price.get("input", 0))
+        + tokens["completion_tokens"] * price.get("output", 0)
+    )
+    return cost / 1_000_000
+
+
+class _Totals:
+    __slots__ = ("calls", "errors", "prompt_tokens", "cached_tokens", "audio_tokens",
+                 "completion_tokens", "images", "latency_secs", "max_latency_secs", "cost_usd")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.audio_tokens = 0
+        self.completion_tokens = 0
+        self.images = 0
+        self.latency_secs = 0.0
+        self.max_latency_secs = 0.0
+        self.cost_usd = 0.0
+
+    def add(self, record: Dict):
+        self.calls += 1
+        if record["error"]:
+            self.errors += 1
+        for name in ("prompt_tokens", "cached_tokens", "audio_tokens", "completion_tokens", "images", "cost_usd"):
+            setattr(self, name, getattr(self, name) + record[name])
+        self.latency_secs += record["latency_secs"]
+        self.max_latency_secs = max(self.max_latency_secs, record["latency_secs"])
+
+    def as_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "audio_tokens": self.audio_tokens,
+            "completion_tokens": self.completion_tokens,
+            "images": self.images,
+            "avg_latency_secs": round(self.latency_secs / self.calls, 3) if self.calls else 0.0,
+            "max_latency_secs": round(self.max_latency_secs, 3),
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+class LLMMetrics:
+    """
+    In-memory accounting of OpenAI calls: totals overall, per endpoint, per model
+    and per request (the last max_requests requests), plus the last max_calls
+    individual call records.
+    """
+
+    def __init__(self, max_calls: int, max_requests: int):
+        self.max_requests = max_requests
+        self.started_at = time.time()
+        self._total = _Totals()
+        self._by_endpoint: Dict[str, _Totals] = {}
+        self._by_model: Dict[str, _Totals] = {}
+        self._by_request: "OrderedDict[str, _Totals]" = OrderedDict()
+        self._recent = deque(maxlen=max_calls)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        model: str,
+        kind: str,
+        response: Any = None,
+        images: int = 0,
+        latency_secs: float = 0.0,
+        queue_secs: float = 0.0,
+        attempts: int = 1,
+        error: Optional[str] = None,
+    ):
+        tokens = usage_tokens(response) if response is not None else {
+            "prompt_tokens": 0, "cached_tokens": 0, "audio_tokens": 0, "completion_tokens": 0,
+        }
+        record = {
+            "at": time.time(),
+            "request_id": request_id_var.get(),
+            "endpoint": endpoint_var.get(),
+            "model": model,
+            "kind": kind,
+            **tokens,
+            "images": images,
+            "latency_secs": round(latency_secs, 3),
+            "queue_secs": round(queue_secs, 3),
+            "attempts": attempts,
+            "cost_usd": estimate_cost(model, tokens),
+            "error": error,
+        }
+        with self._lock:
+            self._total.add(record)
+            self._by_endpoint.setdefault(record["endpoint"], _Totals()).add(record)
+            self._by_model.setdefault(model, _Totals()).add(record)
+            request_totals = self._by_request.get(record["request_id"])
+            if request_totals is None:
+                request_totals = self._by_request[record["request_id"]] = _Totals()
+                while len(self._by_request) > self.max_requests:
+                    self._by_request.popitem(last=False)
+            request_totals.add(record)
+            self._recent.append(record)
+
+    def snapshot(self, request_id: Optional[str] = None) -> Dict:
+        with self._lock:
+            if request_id is not None:
+                totals = self._by_request.get(request_id)
+                return {
+                    "request_id": request_id,
+                    "totals": totals.as_dict() if totals else None,
+                    "calls": [r for r in self._recent if r["request_id"] == request_id],
+                }
+            return {
+                "since": self.started_at,
+                "totals": self._total.as_dict(),
+                "by_endpoint": {name: t.as_dict() for name, t in self._by_endpoint.items()},
+                "by_model": {name: t.as_dict() for name, t in self._by_model.items()},
+                "recent_requests": {rid: t.as_dict() for rid, t in list(reversed(self._by_request.items()))[:50]},
+                "recent_calls": list(self._recent)[-50:],
+            }
+
+
+llm_metrics = LLMMetrics(settings.llm_metrics_max_calls, settings.llm_metrics_max_requests)
@@ -1,29 +1,67 @@
-from openai import AsyncOpenAI, OpenAI
 from apify import (search_instagram_posts_by_keyword,
                     search_instagram_posts_by_keywords, 
                     scrape_instagram_profile, 
                     search_linkedin_posts_by_keyword, 
                     search_twitter_posts_by_keyword)
 import json
-import re
 import asyncio
 from config import settings
-from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
-from typing import List, Optional, Any, Dict
-import httpx
+from typing import List, Optional, Any, Awaitable, BinaryIO, Dict, Callable, AsyncIterator, Tuple, Union
+import io
 import os
+import shutil
 import tempfile
 import base64
 from collections import Counter
+from clients import get_http_client
+from llm_governor import create_chat_completion, parse_chat_completion, create_transcription, llm_priority, PRIORITY_BATCH
+from singleflight import SingleFlight
+from cache import build_cache_backend, MemoryLRUCache, SQLiteCache, TieredCache
+from profile_store import ProfileStore
+from trend_engine import compute_hashtag_trends
+from emergence import score_creators
+from posts import Post, as_posts, hours_since
+from images import downscale_image, estimate_image_tokens, choose_vision_detail
+from media import (spool_download, file_sha256, file_size, media_filename, filename_from_url, ffmpeg_available,
+                   extract_audio, detect_silences, plan_segments, cut_segment)
+import hashlib
+import struct
+import time
+
+
+# Creator profiles already scraped, so repeat lookups only scrape unknown or stale usernames
+profile_store = ProfileStore(
+    build_cache_backend(
+        settings.profile_store_backend,
+        settings.profile_store_path,
+        settings.profile_store_max_bytes,
+    ),
+    ttl=settings.profile_store_ttl,
+    miss_ttl=settings.profile_miss_ttl,
+)
 
+# In-flight image downloads, so concurrent requests for one image share a fetch
+image_flights = SingleFlight()
 
+# Transcripts keyed by media SHA-256 and briefs keyed by normalized text hash
+analysis_cache = build_cache_backend(
+    settings.analysis_cache_backend,
+    settings.analysis_cache_path,
+    settings.analysis_cache_max_bytes,
+)
 
-# Initialize OpenAI async client
-client = AsyncOpenAI(
-    api_key=settings.openai_api_key,
+# Downscaled images ready for the vision payload, keyed by URL and size
+image_cache = TieredCache(
+    MemoryLRUCache(settings.image_cache_max_bytes),
+    SQLiteCache(settings.image_cache_disk_path, settings.image_cache_disk_max_bytes)
+    if settings.image_cache_disk_path else None,
 )
 
+def unique_image_urls(urls):
+    """Drop empty and duplicate image URLs, keeping the first occurrence order"""
+    return list(dict.fromkeys(url for url in urls if url))
+
 def extract_post_context(post_data):
     """
     Extract relevant context from a post for comment generation
@@ -36,30 +74,107 @@ def extract_post_context(post_data):
         "owner_username": post_data.get("ownerUsername", ""),
         "owner_full_name": post_data.get("ownerFullName", ""),
         "post_url": post_data.get("url", ""),
-        "images": post_data.get("images", []) + [post_data.get("displayUrl", None)],
+        "images": unique_image_urls((post_data.get("images") or []) + [post_data.get("displayUrl", None)]),
         "display_url": post_data.get("displayUrl", None)
     }
     return context
 
-async def get_image_content(images):
+async def fetch_image_bytes(image_url):
+    """
+    Download an image through the shared HTTP client, streaming so that anything
+    over settings.image_max_bytes is rejected without being fully downloaded.
+    """
+    max_bytes = settings.image_max_bytes
+    async with get_http_client().stream("GET", image_url, timeout=10.0) as resp:
+        resp.raise_for_status()
+        content_length = resp.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise ValueError(f"Image too large: {content_length} bytes > {max_bytes}")
+        chunks = []
+        size = 0
+        async for chunk in resp.aiter_bytes():
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"Image too large: more than {max_bytes} bytes")
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+async def load_processed_image(image_url, max_side):
+    """
+    Download an image and downscale it to a JPEG no larger than max_side,
+    going through image_cache first.
+    Concurrent misses for the same image (e.g. posts in one batch sharing a
+    picture) share a single download.
+    Returns (jpeg bytes, width, height); width/height are 0 when the image
+    couldn't be decoded and the original bytes are returned instead.
+    """
+    key = f"image:{max_side}:{settings.vision_jpeg_quality}:{image_url}"
+    cached = await image_cache.aget(key)
+    if cached is not None:
+        width, height = struct.unpack(">II", cached[:8])
+        return cached[8:], width, height
+
+    result, _ = await image_flights.do(key, _process_image, key, image_url, max_side)
+    return result
+
+
+async def _process_image(key, image_url, max_side):
+    content = await fetch_image_bytes(image_url)
+    try:
+        content, width, height = await asyncio.to_thread(
+            downscale_image, content, max_side, settings.vision_jpeg_quality
+        )
+    except Exception as e:
+        # Not something Pillow can decode; send the original bytes
+        print(f"Error downscaling image {image_url}: {e}")
+        width = height = 0
+
+    await image_cache.aset(key, struct.pack(">II", width, height) + content, settings.image_cache_ttl)
+    return content, width, height
+
+async def get_image_content(
+    images,
+    max_images: Optional[int] = None,
+    detail: str = "low",
+    stats: Optional[dict] = None,
+    model: str = "gpt-4o-mini",
+):
     """
-    Downloads images from URLs, converts them to base64, and formats for OpenAI Vision.
-    Returns: List of dicts with type/image_url for OpenAI.
+    Downloads images from URLs, downscales them to a bounded JPEG thumbnail, converts
+    them to base64, and formats for OpenAI Vision at the given detail level.
+    Processed images are served from image_cache when available.
+    Empty and duplicate URLs are dropped, at most max_images (default
+    settings.comment_max_images) are used, and they are fetched concurrently.
+    If stats is given, it is filled with the image count, base64 payload bytes and
+    estimated image tokens at model's vision rates.
+    Returns: List of dicts with type/image_url for OpenAI, in input order.
     """
-    img_content = []
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        for image_url in images:
+    max_images = settings.comment_max_images if max_images is None else max_images
+    image_urls = unique_image_urls(images)[:max_images]
+    semaphore = asyncio.Semaphore(settings.image_fetch_concurrency)
+    max_side = settings.vision_high_max_side if detail == "high" else settings.vision_low_max_side
+
+    async def load(image_url):
+        async with semaphore:
             try:
-                resp = await client.get(image_url)
-                resp.raise_for_status()
-                b64 = base64.b64encode(resp.content).decode("utf-8")
-                img_content.append({
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/jpeg;base64,{b64}"}
-                })
+                content, width, height = await load_processed_image(image_url, max_side)
             except Exception as e:
                 print(f"Error processing image {image_url}: {e}")
-    return img_content
+                return None
+        b64 = base64.b64encode(content).decode("utf-8")
+        item = {
+            "type": "image_url",
+            "image_url": {"url": f"data:image/jpeg;base64,{b64}", "detail": detail}
+        }
+        return item, len(b64), estimate_image_tokens(width, height, detail, model)
+
+    results = [r for r in await asyncio.gather(*[load(image_url) for image_url in image_urls]) if r is not None]
+
+    if stats is not None:
+        stats["image_count"] = len(results)
+        stats["image_payload_bytes"] = sum(size for _, size, _ in results)
+        stats["image_tokens"] = sum(tokens for _, _, tokens in results)
+    return [item for item, _, _ in results]
 
 
 
@@ -68,9 +183,12 @@ async def generate_engaging_comment(
     keyword: Optional[str] = None,
     prior_post_text: Optional[str] = None,
     custom_instructions: Optional[str] = None,
+    vision_stats: Optional[dict] = None,
 ):
     """
     Generate an engaging comment for a post using OpenAI (async version)
+    If vision_stats is given, it is filled with the vision detail used, the image
+    count, base64 payload bytes and estimated image tokens sent.
     """
    
     keyword_prompt = f"- Search keyword(s): {keyword}" if keyword else ""
@@ -115,11 +233,23 @@ async def generate_engaging_comment(
 
     system_msg = "You craft incisive, respectful comments that add value, correct gently when needed, and invite conversation without explicit CTAs."
 
-    # Always include images when present (vision models will use them)
-    image_urls = post_context.get("images") or []
+    # Include downscaled images unless the caption alone carries the post
+    image_urls = unique_image_urls(post_context.get("images") or [])[:settings.comment_max_images]
+    detail = choose_vision_detail(
+        post_context.get("caption", ""),
+        len(image_urls),
+        settings.vision_rich_caption_chars,
+        settings.vision_short_caption_chars,
+    )
+    stats = {"vision_detail": detail, "image_count": 0, "image_payload_bytes": 0, "image_tokens": 0}
+
+    # Prefer a strong, vision-capable default; allow override via argument
+    model_name = "gpt-4o-mini"
  
-    if image_urls:
-        user_content = [{"type": "text", "text": prompt}] + await get_image_content(image_urls)
+    if detail:
+        user_content = [{"type": "text", "text": prompt}] + await get_image_content(
+            image_urls, detail=detail, stats=stats, model=model_name
+        )
         
     else:
         user_content = prompt
@@ -129,15 +259,11 @@ async def generate_engaging_comment(
         {"role": "user", "content": user_content},
     ]
 
-    import pprint
-
-    pprint.pprint(messages)
-
-    # Prefer a strong, vision-capable default; allow override via argument
-    model_name = "gpt-4o-mini"
-
+    print(f"🖼️  Vision payload: {stats}")
+    if vision_stats is not None:
+        vision_stats.update(stats)
 
-    response = await client.chat.completions.create(
+    response = await create_chat_completion(
         model=model_name,
         messages=messages,
         max_tokens=120,
@@ -145,9 +271,60 @@ async def generate_engaging_comment(
     )
 
     return response.choices[0].message.content.strip()
-def analyze_post_engagement_potential(post_context):
+
+
+async def generate_comments_stream(items: List[Dict], concurrency: Optional[int] = None) -> AsyncIterator[Dict]:
+    """
+    Generate comments for a batch of posts, at most concurrency (default
+    settings.comment_batch_concurrency) at a time, yielding each result as soon
+    as it is ready (so not in input order).
+
+    items: dicts with "post" and optional "keywords", "prior_post_text", "custom_instructions".
+    Yields {"index", "post_url", "comment", ...vision stats} per post, or
+    {"index", "post_url", "error"} when that post failed; one failure never stops the batch.
+    Images shared between posts are downloaded once (see load_processed_image).
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.comment_batch_concurrency)
+
+    async def generate(index: int, item: Dict) -> Dict:
+        post = item.get("post") or {}
+        result = {"index": index, "post_url": post.get("url", "")}
+        async with semaphore:
+            try:
+                vision_stats = {}
+                comment = await generate_engaging_comment(
+                    extract_post_context(post),
+                    item.get("keywords"),
+                    item.get("prior_post_text"),
+                    item.get("custom_instructions"),
+                    vision_stats=vision_stats,
+                )
+                result.update(comment=comment.strip("\"").strip("\'"), **vision_stats)
+            except Exception as e:
+                print(f"Error generating comment for post {index}: {e}")
+                result["error"] = str(e)
+        return result
+
+    # Tasks copy the current context, so their OpenAI calls queue behind interactive ones
+    priority_token = llm_priority.set(PRIORITY_BATCH)
+    try:
+        tasks = [asyncio.ensure_future(generate(i, item)) for i, item in enumerate(items)]
+    finally:
+        llm_priority.reset(priority_token)
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # Client went away mid-batch; don't keep paying for comments nobody will read
+        for task in tasks:
+            task.cancel()
+
+
+def analyze_post_engagement_potential(post_context, age_hours: Optional[float] = None):
     """
     Analyze if a post has good engagement potential
+    age_hours is how long ago the post went up (see posts.hours_since); posts
+    from the last settings.comment_recent_hours score a point, unknown ages don't.
     """
     likes = post_context.get('likes_count', 0)
     comments = post_context.get('comments_count', 0)
@@ -173,92 +350,180 @@ def analyze_post_engagement_potential(post_context):
         elif comment_ratio > 0.01:  # 1% is decent
             engagement_score += 1
     
-    # Recent posts (we can't check timestamp, so assume all are recent)
-    engagement_score += 1
+    # Recent posts are still collecting replies, so a comment gets seen
+    if age_hours is not None and age_hours <= settings.comment_recent_hours:
+        engagement_score += 1
     
     return engagement_score
 
-def get_users_profiles(usernames, with_related_profiles=False):
+async def get_users_profiles(usernames, with_related_profiles=False):
     """
-    Get the user profile from the usernames
+    Get the user profile from the usernames.
+    Fresh profiles come from profile_store; only missing or stale usernames are scraped,
+    split into chunks that run concurrently (see scrape_profiles_in_chunks).
     """
-    res = {}
-    profile_urls = [f"https://instagram.com/{username}" for username in usernames]
-    profiles = scrape_instagram_profile(profile_urls)
-    for profile in profiles:
+    usernames = [username for username in dict.fromkeys(usernames) if username]
+    profiles, missing = await asyncio.to_thread(profile_store.get_many, usernames)
+
+    if missing:
+        print(f"👤 {len(profiles)} profiles cached, scraping {len(missing)}")
+        profiles.update(await scrape_profiles_in_chunks(missing))
 
-        username = profile.get('username', '')
-        # remove latestPosts from the profile
+    res = {}
+    for username, profile in profiles.items():
         if with_related_profiles:
-            res[username] = {k:v for k,v in profile.items() if k not in ['latestPosts', 'latestIgtvVideos']}
+            res[username] = profile
         else:
-            res[username] = {k:v for k,v in profile.items() if k not in ['latestPosts', 'latestIgtvVideos', 'relatedProfiles']}
+            res[username] = {k:v for k,v in profile.items() if k != 'relatedProfiles'}
     
     return res
 
-def get_user_profile_pics(usernames):
+
+async def scrape_profiles_in_chunks(usernames):
+    """
+    Scrape profiles in chunks of settings.profile_chunk_size, at most
+    settings.profile_scrape_concurrency actor runs at a time.
+    Each chunk is merged into the result and profile_store as soon as it lands.
+    A chunk that runs past settings.profile_chunk_timeout_secs contributes the
+    profiles it scraped so far; a chunk that fails is skipped.
+    Usernames a chunk finished without returning are stored as misses
+    (see ProfileStore.put_missing); timed-out or failed chunks record none.
+    """
+    size = max(settings.profile_chunk_size, 1)
+    chunks = [usernames[i:i + size] for i in range(0, len(usernames), size)]
+    semaphore = asyncio.Semaphore(settings.profile_scrape_concurrency)
+
+    async def scrape_chunk(chunk):
+        async with semaphore:
+            profile_urls = [f"https://instagram.com/{username}" for username in chunk]
+            started = time.monotonic()
+            scraped = await scrape_instagram_profile(
+                profile_urls,
+                timeout_secs=settings.profile_chunk_timeout_secs,
+            )
+            # The actor returns early only when the run finished; at the timeout it may be partial
+            complete = time.monotonic() - started < settings.profile_chunk_timeout_secs
+            return chunk, scraped, complete
+
+    profiles = {}
+    misses = 0
+    for finished in asyncio.as_completed([scrape_chunk(chunk) for chunk in chunks]):
+        try:
+            chunk, scraped, complete = await finished
+        except Exception as e:
+            print(f"⚠️  Error scraping profile chunk: {e}")
+            continue
+        returned = set()
+        chunk_profiles = []
+        for profile in scraped:
+            # remove latestPosts from the profile
+            profile = {k:v for k,v in profile.items() if k not in ['latestPosts', 'latestIgtvVideos']}
+            chunk_profiles.append(profile)
+            profiles[profile.get('username', '')] = profile
+            returned.add((profile.get('username') or '').lower())
+        chunk_misses = [username for username in chunk if username.lower() not in returned] if complete else []
+        misses += len(chunk_misses)
+        # The store may be on disk; write the chunk from a worker thread
+        await asyncio.to_thread(profile_store.put_many, chunk_profiles, chunk_misses)
+
+    print(f"👤 Scraped {len(profiles)}/{len(usernames)} profiles in {len(chunks)} chunks ({misses} not found)")
+    return profiles
+
+async def get_user_profile_pics(usernames):
     """
     Get the user profile pictures from the usernames
     """
-    res = get_users_profiles(usernames)
+    res = await get_users_profiles(usernames)
     for username, profile in res.items():
         res[username] = profile.get('profilePicUrl', '')
     return res
 
-async def process_single_post(post, keyword, profile_pics, post_index, total_posts):
+async def process_single_post(post_context, engagement_score, rank, keyword, profile_pics, total_posts):
     """
-    Process a single post asynchronously
+    Generate a comment for one post picked by select_posts_for_comments (async version)
     """
-    print(f"\n📱 Processing post {post_index + 1}/{total_posts}")
-    
-    # Extract context from the post
-    post_context = extract_post_context(post)
-    print(post_context)
-    
-    # Analyze engagement potential
-    engagement_score = analyze_post_engagement_potential(post_context)
-    
+    print(f"\n📱 Processing post {rank}/{total_posts}")
     print(f"👤 Owner: @{post_context['owner_username']}")
     print(f"❤️  Likes: {post_context['likes_count']}")
     print(f"💬 Comments: {post_context['comments_count']}")
     print(f"📊 Engagement Score: {engagement_score}/7")
-    
-    if engagement_score >= 1:  # Only comment on posts with decent engagement
-        print("🎯 Generating comment...")
-        
-        # Generate engaging comment (async)
-        comment = await generate_engaging_comment(post_context, keyword)
-        
-        result = {
-            "post_url": post_context['post_url'],
-            "owner": post_context['owner_username'],
-            "owner_full_name": post_context['owner_full_name'],
-            "owner_profile_pic": profile_pics.get(post_context['owner_username'], ''),
-            "likes": post_context['likes_count'],
-            "comments": post_context['comments_count'],
-            "engagement_score": engagement_score,
-            "caption_preview": post_context['caption'][:100] + "..." if len(post_context['caption']) > 100 else post_context['caption'],
-            "generated_comment": comment,
-            "hashtags": post_context['hashtags'][:5],
-            "images": post_context['images']
-        }
-        
-        print(f"💡 Generated comment: {comment}")
-        print(f"🔗 Post URL: {post_context['post_url']}")
-        return result
-    else:
-        print("⏭️  Skipping post (low engagement potential)")
-        return None
+    print("🎯 Generating comment...")
+
+    # Generate engaging comment (async)
+    comment = await generate_engaging_comment(post_context, keyword)
+
+    result = {
+        "post_url": post_context['post_url'],
+        "owner": post_context['owner_username'],
+        "owner_full_name": post_context['owner_full_name'],
+        "owner_profile_pic": profile_pics.get(post_context['owner_username'], ''),
+        "likes": post_context['likes_count'],
+        "comments": post_context['comments_count'],
+        "engagement_score": engagement_score,
+        "rank": rank,
+        "caption_preview": post_context['caption'][:100] + "..." if len(post_context['caption']) > 100 else post_context['caption'],
+        "generated_comment": comment,
+        "hashtags": post_context['hashtags'][:5],
+        "images": post_context['images']
+    }
+
+    print(f"💡 Generated comment: {comment}")
+    print(f"🔗 Post URL: {post_context['post_url']}")
+    return result
 
-async def process_keyword_search(keyword, max_comments=20):
+
+def select_posts_for_comments(posts: List[Dict], budget: int, min_score: int = 1) -> List[Tuple[Dict, int]]:
+    """
+    Pick which scraped posts are worth an LLM comment, before spending anything:
+      1. drop duplicate posts (same id / shortCode / URL)
+      2. score every post with analyze_post_engagement_potential, skipping those below min_score
+      3. rank by score, then by raw engagement (likes + comments), then by recency
+      4. keep only the best post per owner
+      5. return the top `budget` as (post context, engagement score), best first
+    """
+    seen = set()
+    candidates = []
+    for raw in posts:
+        post = Post.from_raw(raw)
+        key = post.id or post.url
+        if not key or key in seen:
+            continue
+        seen.add(key)
+
+        context = extract_post_context(raw)
+        score = analyze_post_engagement_potential(context, hours_since(post.timestamp))
+        if score < min_score:
+            continue
+        posted_at = post.timestamp.timestamp() if post.timestamp else 0.0
+        candidates.append(((score, post.engagement, posted_at), context))
+
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    selected = []
+    owners = set()
+    for (score, _, _), context in candidates:
+        owner = context['owner_username']
+        if owner and owner in owners:
+            continue
+        owners.add(owner)
+        selected.append((context, score))
+        if len(selected) >= budget:
+            break
+    return selected
+
+
+async def process_keyword_search(keyword, max_comments: Optional[int] = None):
     """
     Main function to search for posts by keyword and generate comments (async version)
+    Only the top max_comments posts (default settings.comment_llm_budget), as
+    ranked by select_posts_for_comments, get an LLM comment.
     """
+    max_comments = settings.comment_llm_budget if max_comments is None else max_comments
     print(f"🔍 Searching for posts with keyword: '{keyword}'")
     
     try:
         # Search for posts using the keyword
-        posts = search_instagram_posts_by_keyword(keyword)
+        posts = await search_instagram_posts_by_keyword(keyword)
         posts_extracted = []
 
         for post in posts:
@@ -271,20 +536,19 @@ async def process_keyword_search(keyword, max_comments=20):
             return
         
         print(f"✅ Found {len(posts)} posts")
-        
-        # Get all unique owners first
-        owners = set()
-        for post in posts:
-            owners.add(post.get('ownerUsername', ''))
 
-        profile_pics = get_user_profile_pics(list(owners))
+        # Score everything first, then spend the LLM budget on the best posts only
+        selected = select_posts_for_comments(posts, max_comments, settings.comment_min_engagement_score)
+        print(f"🏆 Selected {len(selected)} of {len(posts)} posts for comments")
+
+        # Profile pictures are only needed for the selected owners
+        owners = {context['owner_username'] for context, _ in selected}
+        profile_pics = await get_user_profile_pics(list(owners))
         
         # Process posts in parallel
         tasks = []
-        posts_to_process = posts[:max_comments]
-        
-        for i, post in enumerate(posts_to_process):
-            task = process_single_post(post, keyword, profile_pics, i, len(posts_to_process))
+        for rank, (context, score) in enumerate(selected, start=1):
+            task = process_single_post(context, score, rank, keyword, profile_pics, len(selected))
             tasks.append(task)
         
         # Execute all tasks concurrently
@@ -308,7 +572,7 @@ async def process_keyword_search(keyword, max_comments=20):
         if generated_comments:
             print(f"\n🎯 TOP OPPORTUNITIES:")
             for i, comment_data in enumerate(generated_comments, 1):
-                print(f"\n{i}. @{comment_data['owner']} ({comment_data['likes']} likes)")
+                print(f"\n{i}. @{comment_data['owner']} ({comment_data['likes']} likes, score {comment_data['engagement_score']}/7)")
                 print(f"   Comment: {comment_data['generated_comment']}")
                 print(f"   URL: {comment_data['post_url']}")
         
@@ -336,11 +600,18 @@ def generate_actions_from_posts(keyword, posts_data):
         profile_img_url = post_data.get('owner_profile_pic', '')
         user_url = f"https://instagram.com/{username}"
         
+        # Selection scores, so clients can see why this post was picked
+        scores = {
+            "engagement_score": post_data.get('engagement_score'),
+            "rank": post_data.get('rank'),
+        }
+
         # Action 1: Follow the creator (one follow action per unique creator)
         creator_follow_action = {
             "action": "follow",
             "url": user_url,
-            "img_url": profile_img_url  # Use profile picture for follow actions
+            "img_url": profile_img_url,  # Use profile picture for follow actions
+            **scores,
         }
         
         # Check if we already have a follow action for this creator
@@ -357,7 +628,8 @@ def generate_actions_from_posts(keyword, posts_data):
             "action": "like",
             "url": post_data['post_url'],
             "caption": post_data['caption_preview'],
-            "img_url": post_img_url  # Use post image for like actions
+            "img_url": post_img_url,  # Use post image for like actions
+            **scores,
         }
         actions.append(like_action)
         
@@ -367,17 +639,20 @@ def generate_actions_from_posts(keyword, posts_data):
             "url": post_data['post_url'],
             "comment": post_data['generated_comment'],
             "caption": post_data['caption_preview'],  # Add caption for comment actions
-            "img_url": post_img_url  # Use post image for comment actions
+            "img_url": post_img_url,  # Use post image for comment actions
+            **scores,
         }
         actions.append(comment_action)
     
     return actions
 
 
-async def get_actions_for_keyword(keyword, max_posts=10):
+async def get_actions_for_keyword(keyword, max_posts: Optional[int] = None):
     """
     Simplified function for API use - returns actions for a keyword without logging (async version)
-    Returns actions in the same format as GENERIC_ACTIONS
+    Returns actions in the same format as GENERIC_ACTIONS, with the selection scores
+    of the post each action came from.
+    max_posts is the LLM comment budget (default settings.comment_llm_budget).
     """
     try:
         # Get posts and generated comments for the keyword
@@ -394,13 +669,14 @@ async def get_actions_for_keyword(keyword, max_posts=10):
         print(f"Error generating actions for keyword '{keyword}': {str(e)}")
         return []
 
-async def get_creators(keyword, filters={}, sort_by_emergence: bool = False):
+async def get_creators(keyword, filters={}, sort_by_emergence: bool = False, top_k: Optional[int] = None):
     """
     Get a list of creators for a given keyword and country.
-    If sort_by_emergence is True, calculates emergence scores and returns sorted list.
+    If sort_by_emergence is True, calculates emergence scores and returns sorted list,
+    cut to the top_k creators when given.
     """
     country = filters.get('country', '')
-    posts = search_instagram_posts_by_keywords([keyword])
+    posts = await search_instagram_posts_by_keywords([keyword])
 
     print(f"Found {len(posts)} posts")
     
@@ -409,7 +685,7 @@ async def get_creators(keyword, filters={}, sort_by_emergence: bool = False):
     for post in posts:
         owners.add(post.get('ownerUsername', ''))
 
-    owners_profiles = get_users_profiles(list(owners), with_related_profiles=False)
+    owners_profiles = await get_users_profiles(list(owners), with_related_profiles=False)
 
     for filter_key, value in filters.items():
         if filter_key == 'followers_count_gt':
@@ -418,128 +694,21 @@ async def get_creators(keyword, filters={}, sort_by_emergence: bool = False):
             owners_profiles = {username: profile for username, profile in owners_profiles.items() if profile.get('followersCount', 0) <= value}
 
     if sort_by_emergence:
-        # Calculate emergence scores and return as sorted list
-        creators_with_scores = []
-        for username, profile in owners_profiles.items():
-            # Skip private accounts
-            if profile.get('private', False):
-                continue
-            
-            score_data = calculate_emergence_score(profile, posts)
-            enriched_profile = {**profile, **score_data}
-            creators_with_scores.append(enriched_profile)
-        
-        # Sort by emergence score (highest first)
-        creators_with_scores.sort(key=lambda x: x.get('emergence_score', 0), reverse=True)
-        return creators_with_scores
-    
-    return owners_profiles
+        # Skip private accounts
+        public_profiles = [profile for profile in owners_profiles.values() if not profile.get('private', False)]
 
-
-def calculate_emergence_score(profile: dict, posts: list) -> dict:
-    """
-    Calculate an emergence/growth potential score for a creator.
-    Higher scores indicate creators likely to grow/go viral soon.
-    
-    Factors considered:
-    - Engagement rate (likes + comments per post relative to followers)
-    - Follower-to-following ratio (indicates organic growth)
-    - Posting consistency (active creators grow faster)
-    - Sweet spot follower range (1K-100K = emerging)
-    """
-    followers = profile.get('followersCount', 0)
-    following = profile.get('followsCount', 1)  # Avoid division by zero
-    posts_count = profile.get('postsCount', 0)
-    
-    # Get engagement from recent posts by this creator
-    creator_posts = [p for p in posts if p.get('ownerUsername') == profile.get('username')]
-    
-    total_likes = sum(p.get('likesCount', 0) for p in creator_posts)
-    total_comments = sum(p.get('commentsCount', 0) for p in creator_posts)
-    post_sample_size = len(creator_posts) or 1
+        # Score all creators in one batch and return them sorted (highest first)
+        return score_creators(public_profiles, posts, top_k=top_k)
     
-    avg_likes = total_likes / post_sample_size
-    avg_comments = total_comments / post_sample_size
-    
-    # 1. Engagement Rate Score (0-35 points)
-    # Great engagement rate is 3-6%+, good is 1-3%
-    if followers > 0:
-        engagement_rate = ((avg_likes + avg_comments) / followers) * 100
-    else:
-        engagement_rate = 0
-    
-    if engagement_rate >= 6:
-        engagement_score = 35
-    elif engagement_rate >= 3:
-        engagement_score = 28
-    elif engagement_rate >= 1.5:
-        engagement_score = 20
-    elif engagement_rate >= 0.5:
-        engagement_score = 10
-    else:
-        engagement_score = 3
-    
-    # 2. Follower-to-Following Ratio Score (0-25 points)
-    # High ratio indicates organic growth, people follow without follow-back
-    ff_ratio = followers / max(following, 1)
-    
-    if ff_ratio >= 10:
-        ff_score = 25
-    elif ff_ratio >= 5:
-        ff_score = 20
-    elif ff_ratio >= 2:
-        ff_score = 15
-    elif ff_ratio >= 1:
-        ff_score = 10
-    else:
-        ff_score = 5
-    
-    # 3. Sweet Spot Follower Range Score (0-20 points)
-    # Emerging creators typically have 1K-100K followers
-    if 5000 <= followers <= 50000:
-        size_score = 20  # Prime emerging range
-    elif 1000 <= followers < 5000:
-        size_score = 18  # Micro-influencer, high potential
-    elif 50000 < followers <= 100000:
-        size_score = 15  # Still emerging
-    elif 500 <= followers < 1000:
-        size_score = 12  # Very early stage
-    elif 100000 < followers <= 500000:
-        size_score = 8   # Established but not mega
-    else:
-        size_score = 3   # Either too small or already big
-    
-    # 4. Activity/Consistency Score (0-20 points)
-    # More posts = more active creator
-    if posts_count >= 200:
-        activity_score = 20
-    elif posts_count >= 100:
-        activity_score = 16
-    elif posts_count >= 50:
-        activity_score = 12
-    elif posts_count >= 20:
-        activity_score = 8
-    else:
-        activity_score = 4
-    
-    # Calculate total score
-    total_score = engagement_score + ff_score + size_score + activity_score
-    
-    return {
-        "emergence_score": total_score,
-        "engagement_rate": round(engagement_rate, 2),
-        "ff_ratio": round(ff_ratio, 2),
-        "avg_likes": round(avg_likes, 1),
-        "avg_comments": round(avg_comments, 1),
-    }
+    return owners_profiles
 
 
 async def get_related_instagram_posts(keywords):
     print("Finding posts for keywords:", keywords)
-    posts = await asyncio.to_thread(search_instagram_posts_by_keywords, keywords)
+    posts = await search_instagram_posts_by_keywords(keywords)
 
     owners = {post.get('ownerUsername', '') for post in posts}
-    creator_profiles = await asyncio.to_thread(get_users_profiles, list(owners), False)
+    creator_profiles = await get_users_profiles(list(owners), False)
 
     for post in posts:
         username = post.get('ownerUsername', '')
@@ -587,7 +756,7 @@ async def get_related_linkedin_posts(keyword):
     """
     print(f"Finding LinkedIn posts for keyword: {keyword}")
     # return []
-    posts = await asyncio.to_thread(search_linkedin_posts_by_keyword, keyword, limit=10)
+    posts = await search_linkedin_posts_by_keyword(keyword, limit=10)
     print(f"Returning {len(posts)} LinkedIn posts")
     return posts
  
@@ -597,7 +766,7 @@ async def get_related_twitter_posts(keyword):
     Get related Twitter/X posts for a given keyword using Apify Twitter Scraper
     """
     print(f"Finding Twitter posts for keyword: {keyword}")
-    posts = await asyncio.to_thread(search_twitter_posts_by_keyword, keyword, limit=10)
+    posts = await search_twitter_posts_by_keyword(keyword, limit=10)
     print(f"Returning {len(posts)} Twitter posts")
     return posts
 
@@ -612,11 +781,38 @@ class SocialMediaBrief(BaseModel):
     keywords: List[str] = Field(description="A list of keywords which are strong search terms we can use to find related posts")
 
 
-async def analyze_text_to_brief(text: str) -> SocialMediaBrief:
+# In-flight brief completions, so identical concurrent requests share one call
+brief_flights = SingleFlight()
+
+
+def brief_cache_key(text: str) -> str:
+    """Hash of the text with whitespace collapsed, so re-pasted copies of a post share a brief"""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+async def analyze_text_to_brief(text: str, refresh: bool = False) -> SocialMediaBrief:
     """
     Use OpenAI to extract structured briefing content from a blog post or transcript.
     Returns a validated SocialMediaBrief.
+    Briefs are cached in analysis_cache by normalized text; refresh skips the
+    cached one (the fresh brief still replaces it).
+    Concurrent calls for the same text share a single completion.
     """
+    key = brief_cache_key(text)
+    if not refresh and analysis_cache is not None:
+        cached = await analysis_cache.aget(f"brief:{key}")
+        if cached is not None:
+            print(f"♻️  Brief cache hit ({key[:12]})")
+            return SocialMediaBrief.model_validate_json(cached)
+
+    brief, _ = await brief_flights.do(key, _complete_brief, text)
+    if brief is not None and analysis_cache is not None:
+        await analysis_cache.aset(f"brief:{key}", brief.model_dump_json().encode("utf-8"), settings.brief_cache_ttl)
+    return brief
+
+
+async def _complete_brief(text: str) -> SocialMediaBrief:
     print(f"Analyzing text to brief: {text[:8000]}")
     system_msg = (
         "You are a senior social strategist. Read the provided content and produce "
@@ -635,7 +831,7 @@ async def analyze_text_to_brief(text: str) -> SocialMediaBrief:
         "- Aim for 5-10 items for each list when content allows.\n\n"
         f"Content:\n{text[:8000]}"
     )
-    response = await client.beta.chat.completions.parse(
+    response = await parse_chat_completion(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": system_msg},
@@ -655,275 +851,258 @@ async def analyze_text_to_brief(text: str) -> SocialMediaBrief:
     return None
 
 
-async def transcribe_media_bytes(file_bytes: bytes, filename: str) -> str:
+async def transcribe_media_file(file: BinaryIO, filename: str) -> str:
     """
-    Transcribe audio/video bytes to text using OpenAI transcription.
+    Transcribe an audio/video file object to text using OpenAI transcription.
+    The file is streamed into the upload as-is, never read fully into memory.
     Supports common audio and video formats (e.g., mp3, m4a, wav, mp4, mov).
     """
-    suffix = os.path.splitext(filename or "")[1] or ".mp4"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(file_bytes)
-        tmp_path = tmp.name
+    transcription = await create_transcription(
+        (media_filename(filename), file),
+        model="gpt-4o-transcribe",
+    )
+    text = getattr(transcription, "text", None)
+    if not text and hasattr(transcription, "to_dict"):
+        text = transcription.to_dict().get("text", "")
+    return text or ""
+
+
+async def fake_transcribe_media_file(file: BinaryIO, filename: str) -> str:
+    """
+    Offline stand-in for transcribe_media_file (settings.transcriber = "fake"):
+    makes no API call and returns "[filename: N bytes]", so local runs and tests
+    can see which file ended up where in the stitched transcript.
+    """
+    return f"[{filename}: {file_size(file)} bytes]"
 
+
+TRANSCRIBERS = {
+    "openai": transcribe_media_file,
+    "fake": fake_transcribe_media_file,
+}
+
+
+async def transcribe_media(
+    file: BinaryIO,
+    filename: str,
+    transcriber: Optional[Callable[[BinaryIO, str], Awaitable[str]]] = None,
+) -> str:
+    """
+    Transcribe long audio/video:
+      1. ffmpeg extracts the audio track as compact mono AAC (no video frames uploaded)
+      2. the audio is split at silences into ~transcribe_segment_target_secs segments
+      3. segments are transcribed concurrently (at most transcribe_concurrency at once)
+      4. segment transcripts are stitched back together in order
+
+    transcriber(file, filename) transcribes one file (default: the one named by
+    settings.transcriber; "fake" exercises the pipeline offline).
+    Without ffmpeg, or when extraction fails, the media is sent to the transcriber as-is.
+    """
+    transcriber = transcriber or TRANSCRIBERS[settings.transcriber]
+    ffmpeg = settings.ffmpeg_path
+    if not settings.transcribe_segmented or not ffmpeg_available(ffmpeg):
+        return await transcriber(file, filename)
+
+    workdir = await asyncio.to_thread(tempfile.mkdtemp, prefix="transcribe-")
     try:
-        with open(tmp_path, "rb") as f:
-            transcription = await client.audio.transcriptions.create(
-                model="gpt-4o-transcribe",
-                file=f,
-            )
-        text = getattr(transcription, "text", None)
-        if not text and hasattr(transcription, "to_dict"):
-            text = transcription.to_dict().get("text", "")
-        return text or ""
-    finally:
+        input_path = os.path.join(workdir, "input" + os.path.splitext(media_filename(filename))[1])
+        await asyncio.to_thread(_copy_to_path, file, input_path)
+
+        audio_path = os.path.join(workdir, "audio.m4a")
         try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
+            await extract_audio(ffmpeg, input_path, audio_path, settings.transcribe_audio_sample_rate, settings.transcribe_audio_bitrate)
+            duration, silences = await detect_silences(ffmpeg, audio_path, settings.transcribe_silence_noise_db, settings.transcribe_silence_min_secs)
+        except RuntimeError as e:
+            print(f"⚠️ Audio extraction failed, transcribing the original media: {e}")
+            file.seek(0)
+            return await transcriber(file, filename)
+
+        segments = plan_segments(duration, silences, settings.transcribe_segment_target_secs, settings.transcribe_segment_max_secs)
+        print(f"🎧 Extracted {duration:.0f}s of audio ({os.path.getsize(audio_path)} bytes), {len(segments)} segment(s)")
+
+        semaphore = asyncio.Semaphore(settings.transcribe_concurrency)
+
+        async def transcribe_segment(index: int, start: float, end: float) -> str:
+            async with semaphore:
+                if len(segments) == 1:
+                    segment_path = audio_path
+                else:
+                    segment_path = os.path.join(workdir, f"segment-{index:04d}.m4a")
+                    await cut_segment(ffmpeg, audio_path, start, end, segment_path)
+                with open(segment_path, "rb") as f:
+                    return await transcriber(f, os.path.basename(segment_path))
+
+        tasks = [asyncio.ensure_future(transcribe_segment(i, start, end)) for i, (start, end) in enumerate(segments)]
+        try:
+            texts = await asyncio.gather(*tasks)
+        except BaseException:
+            # One segment failed; don't leave the rest running against a deleted workdir
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return " ".join(text.strip() for text in texts if text and text.strip())
+    finally:
+        await asyncio.to_thread(shutil.rmtree, workdir, True)
+
 
+def _copy_to_path(file: BinaryIO, path: str):
+    file.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file, out, 1024 * 1024)
 
-async def transcribe_from_url(url: str) -> str:
+
+async def transcribe_media_bytes(file_bytes: bytes, filename: str) -> str:
     """
-    Download media from URL and transcribe.
+    Transcribe audio/video bytes to text using OpenAI transcription.
     """
-    async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client_http:
-        r = await client_http.get(url)
-        r.raise_for_status()
-        content = r.content
-    print(content)
-    # Derive filename from URL path
-    parsed_name = url.split("?")[0].rstrip("/").split("/")[-1] or "media.mp4"
-    return await transcribe_media_bytes(content, parsed_name)
+    return await transcribe_media(io.BytesIO(file_bytes), filename)
+
 
-def calculate_trend_score(posts: List[Dict], timeframe_hours: int = 24) -> float:
+async def transcribe_cached(file: BinaryIO, filename: str, digest: Optional[str] = None, refresh: bool = False) -> str:
     """
-    Calculate a trending score based on:
-    - Engagement velocity (likes/comments per hour)
-    - Number of posts in timeframe
-    - Engagement rate
+    transcribe_media through analysis_cache, keyed by the SHA-256 of the media bytes
+    (hashed here in a worker thread when the caller doesn't already have it).
+    refresh skips the cached transcript (the fresh one still replaces it).
     """
-    if not posts:
-        return 0.0
-    
-    recent_posts = []
-    now = datetime.utcnow()
-    cutoff = now - timedelta(hours=timeframe_hours)
-    
-    for post in posts:
-        # Try different timestamp fields
-        timestamp_str = post.get('timestamp') or post.get('created_at') or post.get('createTime')
-        if timestamp_str:
-            try:
-                # Handle Unix timestamp (TikTok)
-                if isinstance(timestamp_str, (int, float)):
-                    post_time = datetime.fromtimestamp(timestamp_str)
-                else:
-                    # Handle ISO format (Instagram)
-                    post_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                
-                if post_time >= cutoff:
-                    recent_posts.append(post)
-            except:
-                # If parsing fails, include the post
-                recent_posts.append(post)
-        else:
-            # If no timestamp, assume it's recent
-            recent_posts.append(post)
-    
-    if not recent_posts:
-        return 0.0
-    
-    # Calculate metrics
-    total_engagement = 0
-    total_views = 0
-    
-    for post in recent_posts:
-        # Platform detection and engagement calculation
-        platform = post.get('platform', '')
-        
-        if platform == 'twitter' or 'engagement' in post:
-            # Twitter
-            engagement = post.get('engagement', {})
-            likes = engagement.get('likes', 0)
-            retweets = engagement.get('retweets', 0)
-            replies = engagement.get('replies', 0)
-            total_engagement += likes + (retweets * 2) + replies
-            total_views += max(likes * 15, 100)  # Estimate views from likes
-            
-        elif 'numLikes' in post or 'reactionCount' in post:
-            # LinkedIn
-            reactions = post.get('numLikes', 0) or post.get('reactionCount', 0)
-            comments = post.get('numComments', 0) or post.get('commentCount', 0)
-            shares = post.get('numShares', 0) or post.get('shareCount', 0)
-            total_engagement += reactions + comments + (shares * 2)
-            total_views += max(reactions * 20, 100)  # Estimate views from reactions
-            
-        else:
-            # Instagram
-            likes = post.get('likesCount', 0) or post.get('likes', 0)
-            comments = post.get('commentsCount', 0) or post.get('comments', 0)
-            total_engagement += likes + comments
-            total_views += max(likes * 10, 100)  # Estimate views from likes
-    
-    engagement_rate = (total_engagement / total_views * 100) if total_views > 0 else 0
-    
-    # Velocity: engagement per hour
-    velocity = total_engagement / timeframe_hours if timeframe_hours > 0 else 0
-    
-    # Post frequency score
-    frequency_score = len(recent_posts) * 10
-    
-    # Combined score (weighted)
-    trend_score = (
-        velocity * 0.4 +           # 40% weight on velocity
-        engagement_rate * 0.3 +     # 30% weight on engagement rate
-        frequency_score * 0.3       # 30% weight on post frequency
+    if digest is None:
+        digest = await asyncio.to_thread(file_sha256, file)
+    key = f"transcript:{digest}"
+    if not refresh and analysis_cache is not None:
+        cached = await analysis_cache.aget(key)
+        if cached is not None:
+            print(f"♻️  Transcript cache hit ({digest[:12]})")
+            return cached.decode("utf-8")
+
+    text = await transcribe_media(file, filename)
+    if text and analysis_cache is not None:
+        await analysis_cache.aset(key, text.encode("utf-8"), settings.transcript_cache_ttl)
+    return text
+
+
+async def transcribe_from_url(url: str, refresh: bool = False) -> str:
+    """
+    Download media from URL into a spooled temp file (bounded by media_max_bytes) and transcribe.
+    """
+    spool, size, digest = await spool_download(
+        get_http_client(),
+        url,
+        max_bytes=settings.media_max_bytes,
+        spool_max_memory=settings.media_spool_max_memory,
+        chunk_size=settings.media_chunk_size,
+        timeout=settings.media_download_timeout_secs,
     )
-    
-    return round(trend_score, 2)
+    with spool:
+        print(f"📥 Downloaded {size} bytes of media from {url}")
+        return await transcribe_cached(spool, filename_from_url(url), digest=digest, refresh=refresh)
+
+
+# Scraper (keyword, timeout_secs) and log label for each platform supported by fetch_niche_posts
+NICHE_SCRAPERS = {
+    "instagram": lambda keyword, timeout_secs: search_instagram_posts_by_keywords([keyword], limit=50, timeout_secs=timeout_secs),
+    "linkedin": lambda keyword, timeout_secs: search_linkedin_posts_by_keyword(keyword, limit=50, timeout_secs=timeout_secs),
+    "twitter": lambda keyword, timeout_secs: search_twitter_posts_by_keyword(keyword, limit=50, timeout_secs=timeout_secs),
+}
+NICHE_PLATFORM_LABELS = {
+    "instagram": "📸 Instagram",
+    "linkedin": "💼 LinkedIn",
+    "twitter": "🐦 Twitter",
+}
 
 
 async def fetch_niche_posts(
     niche_keywords: List[str],
     platforms: List[str] = ["instagram", "linkedin", "twitter"],
+    on_progress: Optional[Callable[[Dict], Any]] = None,
 ) -> List[Dict]:
     """
     Fetch posts from all selected platforms for given keywords.
     Tags each post with _platform so downstream analysis knows the source.
     Returns a single flat list of posts.
+    If on_progress is given it is called with a progress dict after each
+    platform x keyword scrape finishes.
+
+    Every platform x keyword scrape runs concurrently, capped by
+    settings.niche_fetch_concurrency overall and settings.niche_platform_concurrency
+    per platform. Each scrape has its own timeout (settings.niche_fetch_timeout_secs):
+    the actor run is aborted then and the posts it scraped so far are kept.
+    A failing keyword only loses its own posts.
     """
-    all_posts = []
-    
-    # 1. Instagram
-    if "instagram" in platforms:
-        print(f"📸 Fetching Instagram posts for {len(niche_keywords)} keywords...")
-        for keyword in niche_keywords:
-            try:
-                posts = await asyncio.to_thread(
-                    search_instagram_posts_by_keywords,
-                    [keyword],
-                    limit=50
-                )
-                for post in posts:
-                    post['_platform'] = 'instagram'
-                    all_posts.append(post)
-            except Exception as e:
-                print(f"⚠️  Error fetching Instagram keyword '{keyword}': {e}")
-    
-    # 2. LinkedIn
-    if "linkedin" in platforms:
-        print(f"💼 Fetching LinkedIn posts for {len(niche_keywords)} keywords...")
-        for keyword in niche_keywords:
-            try:
-                posts = await asyncio.to_thread(
-                    search_linkedin_posts_by_keyword,
-                    keyword,
-                    limit=50
-                )
-                for post in posts:
-                    post['_platform'] = 'linkedin'
-                    all_posts.append(post)
-            except Exception as e:
-                print(f"⚠️  Error fetching LinkedIn keyword '{keyword}': {e}")
-    
-    # 3. Twitter
-    if "twitter" in platforms:
-        print(f"🐦 Fetching Twitter posts for {len(niche_keywords)} keywords...")
-        for keyword in niche_keywords:
+    selected = [platform for platform in NICHE_SCRAPERS if platform in platforms]
+    global_limit = asyncio.Semaphore(settings.niche_fetch_concurrency)
+    platform_limits = {
+        platform: asyncio.Semaphore(
+            settings.niche_platform_concurrency.get(platform, settings.niche_fetch_concurrency)
+        )
+        for platform in selected
+    }
+    total = len(selected) * len(niche_keywords)
+    completed = 0
+
+    def report(platform, keyword, posts, error=None):
+        nonlocal completed
+        completed += 1
+        if on_progress is not None:
+            on_progress({
+                'platform': platform,
+                'keyword': keyword,
+                'posts': len(posts),
+                'error': error,
+                'completed': completed,
+                'total': total,
+            })
+
+    async def fetch_one(platform, keyword):
+        label = NICHE_PLATFORM_LABELS[platform]
+        async with platform_limits[platform], global_limit:
             try:
-                posts = await asyncio.to_thread(
-                    search_twitter_posts_by_keyword,
-                    keyword,
-                    limit=50
+                # The actor run itself stops at the timeout; the outer limit only guards
+                # against a hung dataset read or abort, with some grace for both
+                posts = await asyncio.wait_for(
+                    NICHE_SCRAPERS[platform](keyword, int(settings.niche_fetch_timeout_secs)),
+                    timeout=settings.niche_fetch_timeout_secs + settings.niche_fetch_abort_grace_secs,
                 )
-                for post in posts:
-                    post['_platform'] = 'twitter'
-                    all_posts.append(post)
+            except asyncio.TimeoutError:
+                print(f"⚠️  Timed out fetching {label} keyword '{keyword}'")
+                report(platform, keyword, [], "timeout")
+                return []
             except Exception as e:
-                print(f"⚠️  Error fetching Twitter keyword '{keyword}': {e}")
+                print(f"⚠️  Error fetching {label} keyword '{keyword}': {e}")
+                report(platform, keyword, [], str(e))
+                return []
+        for post in posts:
+            post['_platform'] = platform
+        report(platform, keyword, posts)
+        return posts
+
+    for platform in selected:
+        print(f"{NICHE_PLATFORM_LABELS[platform]}: fetching posts for {len(niche_keywords)} keywords...")
+
+    # Results come back in platform-then-keyword order, same as a sequential fetch
+    results = await asyncio.gather(*[
+        fetch_one(platform, keyword)
+        for platform in selected
+        for keyword in niche_keywords
+    ])
+    all_posts = [post for posts in results for post in posts]
     
     print(f"📦 Total posts fetched: {len(all_posts)}")
     return all_posts
 
 
 def analyze_hashtags_from_posts(
-    all_posts: List[Dict],
+    all_posts: List[Union[Dict, Post]],
     timeframe_hours: int = 24
 ) -> Dict:
     """
     Extract and score trending hashtags from already-fetched posts.
     Returns the hashtag trending results dict.
+    Scoring is done in one vectorized pass by trend_engine.compute_hashtag_trends.
     """
-    all_hashtag_data = {}
-    
-    for post in all_posts:
-        platform = post.get('_platform', 'unknown')
-        
-        # Extract hashtags depending on platform
-        if platform == 'instagram':
-            hashtags = post.get('hashtags', [])
-        else:
-            text = post.get('text', '') or post.get('commentary', '') or ''
-            hashtags = re.findall(r'#(\w+)', text)
-        
-        for tag in hashtags:
-            tag_clean = tag.lower().strip('#')
-            
-            if tag_clean not in all_hashtag_data:
-                all_hashtag_data[tag_clean] = {
-                    'posts': [],
-                    'platforms': set(),
-                    'total_engagement': 0,
-                    'is_official_trend': False
-                }
-            
-            all_hashtag_data[tag_clean]['posts'].append(post)
-            all_hashtag_data[tag_clean]['platforms'].add(platform)
-            
-            # Calculate engagement per platform
-            if platform == 'instagram':
-                all_hashtag_data[tag_clean]['total_engagement'] += (
-                    (post.get('likesCount', 0) or 0) +
-                    (post.get('commentsCount', 0) or 0)
-                )
-            elif platform == 'linkedin':
-                reactions = post.get('numLikes', 0) or post.get('reactionCount', 0) or 0
-                comments = post.get('numComments', 0) or post.get('commentCount', 0) or 0
-                shares = post.get('numShares', 0) or post.get('shareCount', 0) or 0
-                all_hashtag_data[tag_clean]['total_engagement'] += reactions + comments + (shares * 2)
-            elif platform == 'twitter':
-                engagement = post.get('engagement', {})
-                likes = engagement.get('likes', 0) or 0
-                retweets = engagement.get('retweets', 0) or 0
-                replies = engagement.get('replies', 0) or 0
-                all_hashtag_data[tag_clean]['total_engagement'] += likes + (retweets * 2) + replies
-    
     # Calculate trend scores
     print("📊 Calculating hashtag trend scores...")
-    trending_topics = []
-    
-    for hashtag, data in all_hashtag_data.items():
-        if data['posts']:
-            trend_score = calculate_trend_score(data['posts'], timeframe_hours)
-        else:
-            trend_score = 0
-        
-        # Boost score if trending on multiple platforms
-        platform_multiplier = len(data['platforms']) * 1.5
-        trend_score *= platform_multiplier
-        
-        if trend_score > 5:
-            recent_post_count = len([p for p in data['posts'] if is_recent_post(p, timeframe_hours)])
-            
-            trending_topics.append({
-                'topic': f"#{hashtag}",
-                'trend_score': round(trend_score, 2),
-                'platforms': list(data['platforms']),
-                'post_count': len(data['posts']),
-                'total_engagement': data['total_engagement'],
-                'sample_posts': data['posts'][:5],
-                'velocity': f"+{recent_post_count} posts/{timeframe_hours}h",
-            })
+    trending_topics = compute_hashtag_trends(all_posts, timeframe_hours)
     
     trending_topics.sort(key=lambda x: x['trend_score'], reverse=True)
     
@@ -957,28 +1136,84 @@ async def identify_trending_topics(
     """
     Identify trending topics in your niche across Instagram, LinkedIn, and Twitter.
     Fetches posts ONCE, then runs two analyses in parallel:
-      1. Hashtag extraction and scoring
-      2. Conversation clustering via OpenAI
+      1. Hashtag extraction and scoring (CPU-bound, in a worker thread)
+      2. Conversation clustering via OpenAI (network-bound, on the event loop)
     """
-    # Step 1: Fetch all posts once
-    all_posts = await fetch_niche_posts(niche_keywords, platforms)
+    # Step 1: Fetch all posts once and normalize them for both analyses
+    all_posts = as_posts(await fetch_niche_posts(niche_keywords, platforms))
     
-    # Step 2: Run both analyses on the same data
-    hashtag_results = analyze_hashtags_from_posts(all_posts, timeframe_hours)
-    conversation_results = await analyze_conversations_from_posts(all_posts, niche_keywords)
+    # Step 2: Run both analyses on the same data, overlapping each other
+    hashtag_results, conversation_results = await asyncio.gather(
+        asyncio.to_thread(analyze_hashtags_from_posts, all_posts, timeframe_hours),
+        analyze_conversations_from_posts(all_posts, niche_keywords),
+    )
     
     return {
         'trending_topics': hashtag_results['trending_topics'],
         'conversations': conversation_results,
-        'summary': {
-            **hashtag_results['summary'],
-            'niche_keywords': niche_keywords,
-            'platforms_analyzed': platforms,
-            'top_trend': hashtag_results['trending_topics'][0] if hashtag_results['trending_topics'] else None,
-        }
+        'summary': build_trending_summary(hashtag_results, niche_keywords, platforms),
+    }
+
+
+def build_trending_summary(hashtag_results: Dict, niche_keywords: List[str], platforms: List[str]) -> Dict:
+    """Summary block shared by the trending topics response and stream"""
+    return {
+        **hashtag_results['summary'],
+        'niche_keywords': niche_keywords,
+        'platforms_analyzed': platforms,
+        'top_trend': hashtag_results['trending_topics'][0] if hashtag_results['trending_topics'] else None,
     }
 
 
+async def stream_trending_topics(
+    niche_keywords: List[str],
+    platforms: List[str] = ["instagram", "linkedin", "twitter"],
+    timeframe_hours: int = 24
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Same analysis as identify_trending_topics, yielded as (event, data) pairs
+    as soon as each piece is ready:
+      - fetch_progress: one per platform x keyword scrape
+      - posts_fetched: totals once every scrape is done
+      - hashtags: the hashtag leaderboard and summary
+      - conversations: the conversation clusters
+      - done: the final summary
+    """
+    progress = asyncio.Queue()
+    fetch_task = asyncio.ensure_future(
+        fetch_niche_posts(niche_keywords, platforms, on_progress=progress.put_nowait)
+    )
+    fetch_task.add_done_callback(lambda _: progress.put_nowait(None))
+
+    try:
+        while (event := await progress.get()) is not None:
+            yield 'fetch_progress', event
+        all_posts = as_posts(fetch_task.result())
+    finally:
+        # The client went away (or a scrape raised); stop the remaining scrapes
+        if not fetch_task.done():
+            fetch_task.cancel()
+
+    yield 'posts_fetched', {
+        'total_posts': len(all_posts),
+        'by_platform': dict(Counter(post.platform for post in all_posts)),
+    }
+
+    # Start clustering first so the OpenAI call overlaps the hashtag scoring
+    conversation_task = asyncio.ensure_future(analyze_conversations_from_posts(all_posts, niche_keywords))
+    try:
+        hashtag_results = await asyncio.to_thread(analyze_hashtags_from_posts, all_posts, timeframe_hours)
+        yield 'hashtags', hashtag_results
+
+        conversation_results = await conversation_task
+        yield 'conversations', conversation_results
+    finally:
+        if not conversation_task.done():
+            conversation_task.cancel()
+
+    yield 'done', {'summary': build_trending_summary(hashtag_results, niche_keywords, platforms)}
+
+
 class SampleQuote(BaseModel):
     """A sample quote with the post numbers it came from"""
     quote: str = Field(description="A quote from the posts that represent this topic")
@@ -1000,125 +1235,239 @@ class TrendingConversations(BaseModel):
     clusters: List[ConversationCluster]
 
 
-async def analyze_conversations_from_posts(
-    all_posts: List[Dict],
+class MergedConversationCluster(BaseModel):
+    """A final conversation topic built from one or more shard clusters"""
+    topic: str = Field(description="Short label for this conversation cluster, 3-6 words")
+    description: str = Field(description="One sentence explaining what people are saying about this topic")
+    sentiment: str = Field(description="Overall sentiment: positive, negative, mixed, or neutral")
+    subtopics: List[str] = Field(description="2-4 more specific angles within this topic")
+    source_cluster_ids: List[int] = Field(description="IDs of the input clusters merged into this topic")
+
+
+class MergedConversations(BaseModel):
+    """Structured output for the reduce step of map-reduce clustering"""
+    clusters: List[MergedConversationCluster]
+
+
+CLUSTER_SYSTEM_PROMPT = (
+    "You are a social media trend analyst. Analyze the following numbered posts from "
+    "Instagram, LinkedIn, and Twitter to identify trending conversation topics "
+    "and themes. Group similar posts into clusters. Focus on what people are "
+    "ACTUALLY talking about — the substance of their posts, not just hashtags.\n\n"
+    "IMPORTANT RULES:\n"
+    "- Each post is numbered (POST 1, POST 2, etc.). You MUST reference these numbers.\n"
+    # "- For sample_quotes: Copy text EXACTLY and VERBATIM from the posts. Do NOT paraphrase or invent quotes.\n"
+    "- For related_post_numbers: List ALL post numbers that discuss this topic.\n"
+    "- For each sample_quote: Include the post_numbers array with the POST number(s) the quote comes from.\n"
+    "- Only use information from the provided posts. Do NOT invent or hallucinate content.\n"
+    "- Rank clusters by how frequently topics appear and how much engagement they get.\n"
+)
+
+
+async def _cluster_posts(
+    posts: List[Post],
+    first_number: int,
     niche_keywords: List[str],
-) -> Dict:
+    cluster_range: str,
+) -> List[ConversationCluster]:
     """
-    Analyze actual post text to find trending conversation topics using OpenAI.
-    Takes already-fetched posts (no extra Apify calls).
+    Cluster one batch of posts in a single completion. Posts are numbered from
+    first_number, so numbers in the result are global post numbers; numbers
+    outside this batch are dropped.
     """
-    if not all_posts:
-        return {'clusters': [], 'total_posts_analyzed': 0, 'post_index': []}
-
-    # Build post text entries with engagement, platform info, and URL
-    post_entries = []
-    for post in all_posts:
-        platform = post.get('_platform', 'unknown')
-
-        # Extract text, engagement, and URL depending on platform
-        if platform == 'instagram':
-            text = post.get('caption', '') or ''
-            engagement = (post.get('likesCount', 0) or 0) + (post.get('commentsCount', 0) or 0)
-            url = post.get('url', '') or post.get('shortCode', '')
-            if url and not url.startswith('http'):
-                url = f"https://www.instagram.com/p/{url}/"
-        elif platform == 'linkedin':
-            text = post.get('text', '') or post.get('commentary', '') or ''
-            reactions = post.get('numLikes', 0) or post.get('reactionCount', 0) or 0
-            comments = post.get('numComments', 0) or post.get('commentCount', 0) or 0
-            engagement = reactions + comments
-            url = post.get('url', '') or post.get('postUrl', '') or ''
-        elif platform == 'twitter':
-            text = post.get('text', '') or ''
-            eng = post.get('engagement', {})
-            engagement = (eng.get('likes', 0) or 0) + (eng.get('retweets', 0) or 0)
-            url = post.get('url', '') or post.get('tweetUrl', '') or ''
-        else:
-            text = post.get('caption', '') or post.get('text', '') or ''
-            engagement = 0
-            url = post.get('url', '') or ''
-
-        if text and len(text.strip()) > 20:
-            post_entries.append({
-                'text': text[:500],
-                'platform': platform,
-                'engagement': engagement,
-                'url': url or '',
-            })
-
-    if not post_entries:
-        return {'clusters': [], 'total_posts_analyzed': 0, 'post_index': []}
+    combined_text = ""
+    for i, p in enumerate(posts, start=first_number):
+        combined_text += f"POST {i} [{p.platform.upper()}] (engagement: {p.engagement}): {p.text[:500]}\n---\n"
 
-    # Sort by engagement so we analyze the most impactful posts first
-    post_entries.sort(key=lambda x: x['engagement'], reverse=True)
+    response = await parse_chat_completion(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": CLUSTER_SYSTEM_PROMPT + f"- Return {cluster_range} clusters."
+            },
+            {
+                "role": "user",
+                "content": (
+                    f"Analyze these {len(posts)} numbered social media posts about "
+                    f"'{', '.join(niche_keywords)}' and identify the top trending conversation "
+                    f"topics.\n\n"
+                    f"For each cluster, provide:\n"
+                    f"- topic: A short label (3-6 words)\n"
+                    f"- description: One sentence about what people are saying\n"
+                    f"- related_post_numbers: List of POST numbers that discuss this topic\n"
+                    f"- sentiment: positive, negative, mixed, or neutral\n"
+                    f"- sample_quotes: 2-3 objects, each with a 'quote' (copied VERBATIM from a post) "
+                    f"and 'post_numbers' (the POST numbers the quote comes from)\n"
+                    f"- subtopics: 2-4 specific angles within this topic\n\n"
+                    f"Posts:\n{combined_text}"
+                )
+            }
+        ],
+        max_tokens=3000,
+        temperature=0.4,
+        response_format=TrendingConversations,
+    )
 
-    # Take top 100 posts to stay within token limits
-    top_posts = post_entries[:100]
+    parsed = response.choices[0].message.parsed
+    if not parsed:
+        return []
 
-    # Build a numbered post index (for resolving post numbers → URLs later)
-    post_index = []
-    for i, p in enumerate(top_posts, start=1):
-        post_index.append({
-            'post_number': i,
-            'platform': p['platform'],
-            'url': p['url'],
-        })
+    last_number = first_number + len(posts) - 1
+    for cluster in parsed.clusters:
+        cluster.related_post_numbers = [pn for pn in cluster.related_post_numbers if first_number <= pn <= last_number]
+        for sq in cluster.sample_quotes:
+            sq.post_numbers = [pn for pn in sq.post_numbers if first_number <= pn <= last_number]
+    return parsed.clusters
 
-    # Build the numbered text block for OpenAI
-    combined_text = ""
-    for i, p in enumerate(top_posts, start=1):
-        combined_text += f"POST {i} [{p['platform'].upper()}] (engagement: {p['engagement']}): {p['text']}\n---\n"
 
-    print(f"💬 Analyzing {len(top_posts)} posts for conversation clusters...")
+async def _map_reduce_clusters(posts: List[Post], niche_keywords: List[str]) -> List[ConversationCluster]:
+    """
+    Map: cluster shards of conversation_shard_size posts concurrently, each
+    numbered with its global post numbers. Reduce: one completion merges the
+    shard clusters (topics only, no post text) into the final 5-10 topics; their
+    post numbers and quotes are the union of the merged shard clusters.
+    """
+    shard_size = settings.conversation_shard_size
+    shards = [(start + 1, posts[start:start + shard_size]) for start in range(0, len(posts), shard_size)]
+    semaphore = asyncio.Semaphore(settings.conversation_map_concurrency)
+
+    async def map_shard(first_number, shard):
+        async with semaphore:
+            return await _cluster_posts(shard, first_number, niche_keywords, "3-8")
+
+    print(f"🗺️  Clustering {len(posts)} posts in {len(shards)} shards...")
+    results = await asyncio.gather(*[map_shard(first, shard) for first, shard in shards], return_exceptions=True)
+
+    shard_clusters = []
+    for (first_number, _), result in zip(shards, results):
+        if isinstance(result, Exception):
+            # A failed shard only loses its own posts
+            print(f"⚠️  Error clustering posts {first_number}+: {result}")
+            continue
+        shard_clusters.extend(cluster for cluster in result if cluster.related_post_numbers)
+
+    if len(shards) == 1 or not shard_clusters:
+        return shard_clusters
+
+    cluster_list = "\n".join(
+        f"CLUSTER {i} ({len(c.related_post_numbers)} posts, {c.sentiment}): {c.topic} — {c.description} "
+        f"[subtopics: {'; '.join(c.subtopics)}]"
+        for i, c in enumerate(shard_clusters)
+    )
 
     try:
-        response = await client.beta.chat.completions.parse(
+        response = await parse_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {
                     "role": "system",
                     "content": (
-                        "You are a social media trend analyst. Analyze the following numbered posts from "
-                        "Instagram, LinkedIn, and Twitter to identify trending conversation topics "
-                        "and themes. Group similar posts into clusters. Focus on what people are "
-                        "ACTUALLY talking about — the substance of their posts, not just hashtags.\n\n"
+                        "You are a social media trend analyst. The numbered clusters below were found in "
+                        "separate batches of posts, so the same conversation often appears several times. "
+                        "Merge clusters about the same conversation into one topic.\n\n"
                         "IMPORTANT RULES:\n"
-                        "- Each post is numbered (POST 1, POST 2, etc.). You MUST reference these numbers.\n"
-                        # "- For sample_quotes: Copy text EXACTLY and VERBATIM from the posts. Do NOT paraphrase or invent quotes.\n"
-                        "- For related_post_numbers: List ALL post numbers that discuss this topic.\n"
-                        "- For each sample_quote: Include the post_numbers array with the POST number(s) the quote comes from.\n"
-                        "- Only use information from the provided posts. Do NOT invent or hallucinate content.\n"
-                        "- Rank clusters by how frequently topics appear and how much engagement they get.\n"
-                        "- Return 5-10 clusters."
+                        "- List in source_cluster_ids EVERY input CLUSTER number merged into each topic.\n"
+                        "- Only use information from the provided clusters. Do NOT invent topics.\n"
+                        "- Rank topics by total posts and how widespread they are across clusters.\n"
+                        "- Return 5-10 topics."
                     )
                 },
                 {
                     "role": "user",
                     "content": (
-                        f"Analyze these {len(top_posts)} numbered social media posts about "
-                        f"'{', '.join(niche_keywords)}' and identify the top trending conversation "
-                        f"topics.\n\n"
-                        f"For each cluster, provide:\n"
+                        f"Merge these {len(shard_clusters)} conversation clusters about "
+                        f"'{', '.join(niche_keywords)}' into the top trending conversation topics.\n\n"
+                        f"For each topic, provide:\n"
                         f"- topic: A short label (3-6 words)\n"
                         f"- description: One sentence about what people are saying\n"
-                        f"- related_post_numbers: List of POST numbers that discuss this topic\n"
                         f"- sentiment: positive, negative, mixed, or neutral\n"
-                        f"- sample_quotes: 2-3 objects, each with a 'quote' (copied VERBATIM from a post) "
-                        f"and 'post_numbers' (the POST numbers the quote comes from)\n"
-                        f"- subtopics: 2-4 specific angles within this topic\n\n"
-                        f"Posts:\n{combined_text}"
+                        f"- subtopics: 2-4 specific angles within this topic\n"
+                        f"- source_cluster_ids: the CLUSTER numbers merged into it\n\n"
+                        f"Clusters:\n{cluster_list}"
                     )
                 }
             ],
-            max_tokens=3000,
-            temperature=0.4,
-            response_format=TrendingConversations,
+            max_tokens=2000,
+            temperature=0.3,
+            response_format=MergedConversations,
         )
+        merged = response.choices[0].message.parsed
+    except Exception as e:
+        print(f"⚠️  Error merging conversation clusters: {e}")
+        merged = None
+
+    if not merged or not merged.clusters:
+        # Reduce failed; fall back to the largest shard clusters as they are
+        shard_clusters.sort(key=lambda c: len(c.related_post_numbers), reverse=True)
+        return shard_clusters[:10]
+
+    clusters = []
+    for topic in merged.clusters:
+        sources = [shard_clusters[i] for i in dict.fromkeys(topic.source_cluster_ids) if 0 <= i < len(shard_clusters)]
+        if not sources:
+            continue
+        related = sorted({pn for c in sources for pn in c.related_post_numbers})
+        # Quotes from the biggest source clusters first
+        sources.sort(key=lambda c: len(c.related_post_numbers), reverse=True)
+        quotes = [sq for c in sources for sq in c.sample_quotes][:3]
+        clusters.append(ConversationCluster(
+            topic=topic.topic,
+            description=topic.description,
+            related_post_numbers=related,
+            sentiment=topic.sentiment,
+            sample_quotes=quotes,
+            subtopics=topic.subtopics,
+        ))
+    return clusters
 
-        parsed = response.choices[0].message.parsed
 
-        if not parsed:
+async def analyze_conversations_from_posts(
+    all_posts: List[Union[Dict, Post]],
+    niche_keywords: List[str],
+) -> Dict:
+    """
+    Analyze actual post text to find trending conversation topics using OpenAI.
+    Takes already-fetched posts (no extra Apify calls), raw or normalized.
+    Up to conversation_shard_size posts are clustered in one completion; larger
+    sets (up to conversation_max_posts) go through _map_reduce_clusters.
+    Post numbers in the result always refer to the global post_index.
+    """
+    if not all_posts:
+        return {'clusters': [], 'total_posts_analyzed': 0, 'post_index': []}
+
+    # Keep posts with enough text to say something
+    post_entries = [
+        post for post in as_posts(all_posts)
+        if post.text and len(post.text.strip()) > 20
+    ]
+
+    if not post_entries:
+        return {'clusters': [], 'total_posts_analyzed': 0, 'post_index': []}
+
+    # Sort by engagement so we analyze the most impactful posts first
+    post_entries.sort(key=lambda post: post.engagement, reverse=True)
+
+    top_posts = post_entries[:settings.conversation_max_posts]
+
+    # Build a numbered post index (for resolving post numbers → URLs later)
+    post_index = []
+    for i, p in enumerate(top_posts, start=1):
+        post_index.append({
+            'post_number': i,
+            'platform': p.platform,
+            'url': p.url,
+        })
+
+    print(f"💬 Analyzing {len(top_posts)} posts for conversation clusters...")
+
+    try:
+        if len(top_posts) <= settings.conversation_shard_size:
+            clusters = await _cluster_posts(top_posts, 1, niche_keywords, "5-10")
+        else:
+            clusters = await _map_reduce_clusters(top_posts, niche_keywords)
+
+        if not clusters:
             print("⚠️  OpenAI returned no parsed conversations")
             return {'clusters': [], 'total_posts_analyzed': len(post_entries), 'post_index': post_index}
 
@@ -1126,7 +1475,7 @@ async def analyze_conversations_from_posts(
         post_url_lookup = {p['post_number']: p['url'] for p in post_index}
 
         clusters_data = []
-        for cluster in parsed.clusters:
+        for cluster in clusters:
             # Resolve post numbers to URLs for each sample quote
             resolved_quotes = []
             for sq in cluster.sample_quotes:
@@ -1172,24 +1521,6 @@ async def analyze_conversations_from_posts(
         return {'clusters': [], 'total_posts_analyzed': len(post_entries), 'post_index': post_index}
 
 
-def is_recent_post(post: Dict, hours: int) -> bool:
-    """Check if post is within the recent timeframe"""
-    try:
-        timestamp_str = post.get('timestamp') or post.get('created_at') or post.get('createTime')
-        if not timestamp_str:
-            return True
-        
-        if isinstance(timestamp_str, (int, float)):
-            post_time = datetime.fromtimestamp(timestamp_str)
-        else:
-            post_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-        
-        cutoff = datetime.utcnow() - timedelta(hours=hours)
-        return post_time >= cutoff
-    except:
-        return True
-
-
 async def main():
     """
     Main function to run the social promotion script (async version)
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from typing import BinaryIO, List, Optional, Tuple
+
+import httpx
+
+
+class MediaTooLargeError(ValueError):
+    """Media is larger than the configured maximum; surfaced to clients as 413"""
+
+    def __init__(self, max_bytes: int, size: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.size = size
+        detail = f"{size} bytes" if size is not None else "more"
+        super().__init__(f"Media too large: {detail}, limit is {max_bytes} bytes")
+
+
+def media_filename(name: Optional[str], default: str = "media.mp4") -> str:
+    """Filename with an extension (the transcription API infers the format from it)"""
+    name = os.path.basename(name or "") or default
+    return name if os.path.splitext(name)[1] else name + os.path.splitext(default)[1]
+
+
+def filename_from_url(url: str) -> str:
+    return media_filename(url.split("?")[0].rstrip("/").split("/")[-1])
+
+
+def file_size(file: BinaryIO) -> int:
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+async def spool_download(
+    client: httpx.AsyncClient,
+    url: str,
+    max_bytes: int,
+    spool_max_memory: int,
+    chunk_size: int,
+    timeout: float,
+) -> Tuple[BinaryIO, int, str]:
+    """
+    Stream url into a SpooledTemporaryFile chunk by chunk: small media stays in
+    memory, anything above spool_max_memory rolls over to disk.
+    Rejects up front when Content-Length is over max_bytes, and stops reading as
+    soon as the body goes over it otherwise (raising MediaTooLargeError).
+    Returns (file rewound to the start, size, SHA-256 hex digest of the body,
+    hashed as it streams); the caller closes the file.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_max_memory)
+    digest = hashlib.sha256()
+    try:
+        async with client.stream("GET", url, timeout=timeout, follow_redirects=True) as response:
+            response.raise_for_status()
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise MediaTooLargeError(max_bytes, int(content_length))
+
+            size = 0
+            async for chunk in response.aiter_bytes(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise MediaTooLargeError(max_bytes)
+                digest.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool, size, digest.hexdigest()
+
+
+def file_sha256(file: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file object, read in chunks and rewound afterwards"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+# ---- ffmpeg audio pipeline ----
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+_DURATION = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+# Tails shorter than this are folded into the previous segment rather than sent on their own
+MIN_SEGMENT_SECS = 1.0
+
+
+def ffmpeg_available(ffmpeg_path: str) -> bool:
+    return shutil.which(ffmpeg_path) is not None
+
+
+async def run_ffmpeg(ffmpeg_path: str, *args: str) -> str:
+    """Run ffmpeg with args; returns its stderr (where ffmpeg logs), raising RuntimeError on failure"""
+    process = await asyncio.create_subprocess_exec(
+        ffmpeg_path, "-hide_banner", "-nostdin", "-y", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await process.communicate()
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    log = stderr.decode("utf-8", errors="replace")
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({process.returncode}): {log[-500:]}")
+    return log
+
+
+async def extract_audio(ffmpeg_path: str, input_path: str, output_path: str, sample_rate: int, bitrate: str):
+    """Drop the video stream and re-encode the audio as compact mono AAC"""
+    await run_ffmpeg(
+        ffmpeg_path, "-i", input_path,
+        "-vn", "-ac", "1", "-ar", str(sample_rate), "-c:a", "aac", "-b:a", bitrate,
+        output_path,
+    )
+
+
+async def detect_silences(ffmpeg_path: str, audio_path: str, noise_db: float, min_silence_secs: float) -> Tuple[float, List[Tuple[float, float]]]:
+    """Returns (duration in seconds, [(silence start, silence end), ...])"""
+    log = await run_ffmpeg(
+        ffmpeg_path, "-i", audio_path,
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_silence_secs}",
+        "-f", "null", "-",
+    )
+    duration_match = _DURATION.search(log)
+    duration = 0.0
+    if duration_match:
+        hours, minutes, seconds = duration_match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    starts = [max(0.0, float(value)) for value in _SILENCE_START.findall(log)]
+    ends = [float(value) for value in _SILENCE_END.findall(log)]
+    # A trailing silence has no silence_end; it runs to the end of the file
+    ends += [duration] * (len(starts) - len(ends))
+    return duration, list(zip(starts, ends))
+
+
+def plan_segments(duration: float, silences: List[Tuple[float, float]], target_secs: float, max_secs: float) -> List[Tuple[float, float]]:
+    """
+    Split [0, duration] into (start, end) segments of roughly target_secs,
+    cutting in the middle of a silence where possible so no word is split.
+    Picks the silence closest to target_secs past the segment start (anywhere
+    from half the target up to max_secs); with no silence in range it cuts hard
+    at target_secs.
+    """
+    cut_points = sorted((start + end) / 2 for start, end in silences)
+    segments = []
+    start = 0.0
+    while duration - start > target_secs:
+        candidates = [point for point in cut_points if start + target_secs / 2 <= point <= start + max_secs]
+        if candidates:
+            end = min(candidates, key=lambda point: abs(point - (start + target_secs)))
+        else:
+            end = start + target_secs
+        if duration - end < MIN_SEGMENT_SECS:
+            break
+        segments.append((start, end))
+        start = end
+    segments.append((start, duration))
+    return segments
+
+
+async def cut_segment(ffmpeg_path: str, audio_path: str, start: float, end: float, output_path: str):
+    await run_ffmpeg(
+        ffmpeg_path, "-ss", f"{start:.3f}", "-to", f"{end:.3f}", "-i", audio_path,
+        "-c", "copy", output_path,
+    )
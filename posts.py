@@ -0,0 +1,190 @@
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Union
+
+
+# Views per like used to estimate reach when a platform doesn't report views
+VIEWS_PER_LIKE = {
+    'instagram': 10,
+    'linkedin': 20,
+    'twitter': 15,
+}
+
+
+def parse_post_time(post: Dict) -> Optional[datetime]:
+    """
+    Parse a post's timestamp (Instagram ISO, Twitter created_at, TikTok Unix time).
+    Returns None when the post has no timestamp or it can't be parsed.
+    """
+    timestamp_str = post.get('timestamp') or post.get('created_at') or post.get('createTime')
+    if not timestamp_str:
+        return None
+    try:
+        if isinstance(timestamp_str, (int, float)):
+            return datetime.fromtimestamp(timestamp_str)
+        return datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+    except Exception:
+        return None
+
+
+def is_recent_time(post_time: Optional[datetime], cutoff: datetime) -> bool:
+    """
+    Whether a parsed post time is at or after cutoff.
+    Posts with no usable time, or a time that can't be compared with the naive
+    UTC cutoff (timezone-aware ISO strings), count as recent.
+    """
+    if post_time is None:
+        return True
+    try:
+        return post_time >= cutoff
+    except TypeError:
+        return True
+
+
+def hours_since(post_time: Optional[datetime], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Age of a parsed post time in hours, against now (default: naive UTC now).
+    Timezone-aware times are converted to UTC first. None when the time is unknown.
+    """
+    if post_time is None:
+        return None
+    if post_time.tzinfo is not None:
+        post_time = post_time.astimezone(timezone.utc).replace(tzinfo=None)
+    return ((now or datetime.utcnow()) - post_time).total_seconds() / 3600
+
+
+def detect_platform(post: Dict) -> str:
+    """Platform of a raw post: its _platform tag, else guessed from its fields"""
+    platform = post.get('_platform')
+    if platform:
+        return platform
+    if post.get('platform') == 'twitter' or 'engagement' in post:
+        return 'twitter'
+    if 'numLikes' in post or 'reactionCount' in post:
+        return 'linkedin'
+    return 'instagram'
+
+
+# Raw fields echoed back in sample_posts (the shape /trending-topics has always returned),
+# minus the bulky ones (comment threads, child posts, music info, profile details)
+SAMPLE_FIELDS = (
+    '_platform', 'platform', 'id', 'shortCode', 'urn', 'type', 'productType',
+    'url', 'postUrl', 'tweetUrl', 'caption', 'text', 'commentary', 'hashtags',
+    'ownerUsername', 'ownerFullName', 'ownerId', 'author', 'displayUrl', 'images',
+    'likesCount', 'commentsCount', 'videoViewCount', 'videoPlayCount',
+    'numLikes', 'numComments', 'numShares', 'reactionCount', 'commentCount', 'shareCount',
+    'likes', 'comments', 'shares', 'sharesCount', 'views', 'playCount', 'engagement',
+    'timestamp', 'created_at', 'createTime', 'locationName', 'isSponsored',
+)
+
+
+def _to_int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class Post:
+    """
+    Compact, platform-independent view of a scraped post.
+    Built once per post at ingestion so scoring and clustering never dig
+    through the raw Apify dict again. The raw dict isn't kept, only its
+    SAMPLE_FIELDS (values shared, not copied) for sample posts in responses.
+    """
+
+    __slots__ = (
+        'platform', 'id', 'url', 'text', 'timestamp',
+        'likes', 'comments', 'shares', 'views', 'hashtags', 'fields',
+    )
+
+    def __init__(self, platform, id, url, text, timestamp, likes, comments, shares, views, hashtags, fields=None):
+        self.platform = platform
+        self.id = id
+        self.url = url
+        self.text = text
+        self.timestamp = timestamp
+        self.likes = likes
+        self.comments = comments
+        self.shares = shares
+        self.views = views
+        self.hashtags = hashtags
+        self.fields = fields or {}
+
+    @property
+    def engagement(self) -> int:
+        """Likes + comments, with shares/retweets/reposts counted double"""
+        return self.likes + self.comments + (self.shares * 2)
+
+    @property
+    def views_estimate(self) -> int:
+        """Estimated reach from likes, floored at 100"""
+        return max(self.likes * VIEWS_PER_LIKE.get(self.platform, 10), 100)
+
+    def sample(self) -> Dict:
+        """The post as echoed in sample_posts: its raw Apify fields, minus the bulky ones"""
+        return dict(self.fields)
+
+    @classmethod
+    def from_raw(cls, post: Dict) -> "Post":
+        platform = detect_platform(post)
+
+        if platform == 'instagram':
+            text = post.get('caption', '') or ''
+            likes = post.get('likesCount', 0) or post.get('likes', 0)
+            comments = post.get('commentsCount', 0) or post.get('comments', 0)
+            shares = 0
+            views = post.get('videoViewCount', 0) or post.get('videoPlayCount', 0)
+            url = post.get('url', '') or post.get('shortCode', '') or ''
+            if url and not url.startswith('http'):
+                url = f"https://www.instagram.com/p/{url}/"
+            post_id = post.get('id') or post.get('shortCode') or ''
+            hashtags = post.get('hashtags', []) or []
+        elif platform == 'linkedin':
+            text = post.get('text', '') or post.get('commentary', '') or ''
+            likes = post.get('numLikes', 0) or post.get('reactionCount', 0)
+            comments = post.get('numComments', 0) or post.get('commentCount', 0)
+            shares = post.get('numShares', 0) or post.get('shareCount', 0)
+            views = 0
+            url = post.get('url', '') or post.get('postUrl', '') or ''
+            post_id = post.get('urn') or post.get('id') or ''
+            hashtags = re.findall(r'#(\w+)', text)
+        elif platform == 'twitter':
+            text = post.get('text', '') or ''
+            engagement = post.get('engagement', {}) or {}
+            likes = engagement.get('likes', 0)
+            comments = engagement.get('replies', 0)
+            shares = engagement.get('retweets', 0)
+            views = engagement.get('views', 0)
+            url = post.get('url', '') or post.get('tweetUrl', '') or ''
+            post_id = post.get('id') or ''
+            hashtags = re.findall(r'#(\w+)', text)
+        else:
+            text = post.get('caption', '') or post.get('text', '') or ''
+            likes = post.get('likesCount', 0) or post.get('likes', 0)
+            comments = post.get('commentsCount', 0) or post.get('comments', 0)
+            shares = post.get('sharesCount', 0) or post.get('shares', 0)
+            views = post.get('playCount', 0) or post.get('views', 0)
+            url = post.get('url', '') or ''
+            post_id = post.get('id') or ''
+            hashtag_text = post.get('text', '') or post.get('commentary', '') or ''
+            hashtags = re.findall(r'#(\w+)', hashtag_text)
+
+        return cls(
+            platform=platform,
+            id=str(post_id),
+            url=url,
+            text=text,
+            timestamp=parse_post_time(post),
+            likes=_to_int(likes),
+            comments=_to_int(comments),
+            shares=_to_int(shares),
+            views=_to_int(views),
+            hashtags=[tag.lower().strip('#') for tag in hashtags],
+            fields={key: post[key] for key in SAMPLE_FIELDS if key in post},
+        )
+
+
+def as_posts(posts: Iterable[Union[Dict, Post]]) -> List[Post]:
+    """Normalize raw post dicts into Posts (Posts pass through unchanged)"""
+    return [post if isinstance(post, Post) else Post.from_raw(post) for post in posts]
@@ -0,0 +1,62 @@
+import json
+from typing import Dict, Iterable, List, Tuple
+
+
+# Stored for usernames the scraper returned nothing for (deleted, private or renamed accounts)
+MISSING = b"null"
+
+
+class ProfileStore:
+    """
+    Persistent store of scraped Instagram profiles keyed by username.
+    Entries expire after ttl seconds, after which the profile is considered
+    stale and gets re-scraped. Usernames the scraper didn't return are
+    remembered as misses for miss_ttl seconds, so they aren't re-scraped on
+    every request.
+    """
+
+    def __init__(self, backend, ttl: int, miss_ttl: int = 0):
+        self.backend = backend
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+
+    @staticmethod
+    def _key(username: str) -> str:
+        return f"profile:{username.lower()}"
+
+    def get_many(self, usernames: List[str]) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Look up profiles for usernames.
+        Returns (profiles keyed by username, usernames that are missing or stale).
+        Known misses are in neither.
+        """
+        found = {}
+        missing = []
+        for username in usernames:
+            value = self.backend.get(self._key(username)) if self.backend is not None else None
+            if value is None:
+                missing.append(username)
+            elif value != MISSING:
+                profile = json.loads(value)
+                found[profile.get('username') or username] = profile
+        return found, missing
+
+    def put(self, profile: dict):
+        username = profile.get('username')
+        if not username or self.backend is None:
+            return
+        value = json.dumps(profile, ensure_ascii=False, default=str).encode("utf-8")
+        self.backend.set(self._key(username), value, self.ttl)
+
+    def put_missing(self, usernames: Iterable[str]):
+        """Remember usernames the scraper returned no profile for"""
+        if self.backend is None or self.miss_ttl <= 0:
+            return
+        for username in usernames:
+            self.backend.set(self._key(username), MISSING, self.miss_ttl)
+
+    def put_many(self, profiles: Iterable[dict], missing: Iterable[str] = ()):
+        """Store scraped profiles and remember the usernames that came back empty"""
+        for profile in profiles:
+            self.put(profile)
+        self.put_missing(missing)
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.dups = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent async calls: while a call for a key is in
+    flight, later callers with the same key await its result instead of
+    starting their own.
+
+    - The work runs in its own task, so one caller being cancelled does not
+      cancel it for the others; it is cancelled only once every caller is gone.
+    - Exceptions raised by the work are re-raised to every caller.
+    - Keys are forgotten as soon as the call finishes (no result caching).
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        Run fn(*args, **kwargs) once per key among concurrent callers.
+        Returns (result, shared); shared is True when more than one caller
+        received this result, in which case it must be treated as read-only.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn(*args, **kwargs)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            call.dups += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+            return result, call.dups > 0
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up; stop the work and let the next caller start afresh
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Modules live at the repo root; tests import them directly
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep tests offline and off disk: no real key needed, in-memory stores, no warm-up
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PROFILE_STORE_BACKEND", "memory")
+os.environ.setdefault("ANALYSIS_CACHE_BACKEND", "memory")
+os.environ.setdefault("WARM_UP_CLIENTS", "false")
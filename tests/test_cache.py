@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from cache import SQLiteCache, TieredCache, MemoryLRUCache
+
+
+def _stored_bytes(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+
+def test_sqlite_running_total_and_lru_eviction(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "c.sqlite3"), max_bytes=300)
+    cache.set("a", b"x" * 100)
+    cache.set("b", b"x" * 100)
+    cache.set("a", b"x" * 50)  # replacing an entry adjusts the total
+    assert cache.size_bytes == _stored_bytes(cache) == 150
+
+    time.sleep(0.01)
+    assert cache.get("a") is not None  # "a" is now more recently used than "b"
+    cache.set("c", b"x" * 200)
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size_bytes == _stored_bytes(cache) == 250
+
+    cache.delete("c")
+    assert cache.size_bytes == _stored_bytes(cache) == 50
+
+
+def test_sqlite_total_survives_reopen_and_expired_rows_are_purged(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    cache = SQLiteCache(path, max_bytes=1000, purge_interval=0)
+    cache.set("short", b"x" * 100, ttl=0.01)
+    cache.set("long", b"x" * 100, ttl=60)
+    assert SQLiteCache(path, max_bytes=1000).size_bytes == 200
+
+    time.sleep(0.02)
+    cache.set("other", b"x" * 10)
+    assert len(cache) == 2
+    assert cache.size_bytes == _stored_bytes(cache) == 110
+
+
+def test_tiered_async_reads_fall_through_to_disk(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "c.sqlite3"), max_bytes=1000)
+
+    async def run():
+        cache = TieredCache(MemoryLRUCache(1000), disk)
+        await cache.aset("k", b"value", ttl=60)
+        fresh = TieredCache(MemoryLRUCache(1000), disk)
+        return await fresh.aget("k"), fresh.memory.get("k")
+
+    assert asyncio.run(run()) == (b"value", b"value")
@@ -0,0 +1,49 @@
+from emergence import score_creators
+
+
+def _profile(username, followers, follows, posts_count):
+    return {"username": username, "followersCount": followers, "followsCount": follows, "postsCount": posts_count}
+
+
+PROFILES = [
+    _profile("ana", 12000, 800, 240),
+    _profile("ben", 2500, 2400, 60),
+    _profile("cam", 900000, 100, 1500),
+    _profile("dee", 700, 0, 10),
+    _profile("eve", 0, 5, 0),
+    _profile("gus", 12000, 800, 240),
+]
+
+POSTS = [
+    {"ownerUsername": "ana", "likesCount": 600, "commentsCount": 40},
+    {"ownerUsername": "ana", "likesCount": 400, "commentsCount": 20},
+    {"ownerUsername": "ben", "likesCount": 30, "commentsCount": 2},
+    {"ownerUsername": "cam", "likesCount": 9000, "commentsCount": 300},
+    {"ownerUsername": "dee", "likesCount": 50, "commentsCount": 10},
+    {"ownerUsername": "gus", "likesCount": 600, "commentsCount": 40},
+    {"ownerUsername": "gus", "likesCount": 400, "commentsCount": 20},
+]
+
+
+def test_emergence_scores_and_ordering():
+    creators = score_creators(PROFILES, POSTS)
+
+    # ana and gus tie; the tie keeps input order
+    assert [
+        (c["username"], c["emergence_score"], c["engagement_rate"], c["ff_ratio"], c["avg_likes"], c["avg_comments"])
+        for c in creators
+    ] == [
+        ("ana", 93, 4.42, 15.0, 500.0, 30.0),
+        ("gus", 93, 4.42, 15.0, 500.0, 30.0),
+        ("dee", 76, 8.57, 700.0, 50.0, 10.0),
+        ("cam", 58, 1.03, 9000.0, 9000.0, 300.0),
+        ("ben", 50, 1.28, 1.04, 30.0, 2.0),
+        ("eve", 15, 0.0, 0.0, 0.0, 0.0),
+    ]
+    assert creators[0]["followersCount"] == 12000
+
+
+def test_top_k_matches_the_full_ranking():
+    full = [c["username"] for c in score_creators(PROFILES, POSTS)]
+    for top_k in range(len(PROFILES) + 2):
+        assert [c["username"] for c in score_creators(PROFILES, POSTS, top_k=top_k)] == full[:top_k]
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from main import analyze_post_engagement_potential, select_posts_for_comments
+
+
+def _post(post_id, owner, likes, comments, hours_ago=None):
+    post = {
+        "id": post_id,
+        "url": f"https://www.instagram.com/p/{post_id}/",
+        "caption": f"post {post_id}",
+        "ownerUsername": owner,
+        "likesCount": likes,
+        "commentsCount": comments,
+    }
+    if hours_ago is not None:
+        post["timestamp"] = (datetime.utcnow() - timedelta(hours=hours_ago)).isoformat() + "Z"
+    return post
+
+
+def test_low_value_post_scores_zero():
+    context = {"likes_count": 3, "comments_count": 0}
+    assert analyze_post_engagement_potential(context) == 0
+    assert analyze_post_engagement_potential(context, age_hours=24 * 30) == 0
+    assert analyze_post_engagement_potential(context, age_hours=2) == 1
+
+
+def test_low_value_posts_are_excluded():
+    posts = [
+        _post("stale", "a", likes=3, comments=0, hours_ago=24 * 30),
+        _post("undated", "b", likes=5, comments=0),
+        _post("popular", "c", likes=2000, comments=150, hours_ago=2),
+        _post("fresh", "d", likes=4, comments=0, hours_ago=1),
+    ]
+    selected = select_posts_for_comments(posts, budget=10, min_score=1)
+    urls = [context["post_url"] for context, _ in selected]
+    assert urls == ["https://www.instagram.com/p/popular/", "https://www.instagram.com/p/fresh/"]
+    assert [score for _, score in selected] == [7, 1]
+
+
+def test_budget_and_owner_dedupe():
+    posts = [
+        _post("a1", "same", likes=500, comments=20, hours_ago=1),
+        _post("a2", "same", likes=5000, comments=300, hours_ago=1),
+        _post("b1", "other", likes=200, comments=1, hours_ago=1),
+        _post("c1", "third", likes=150, comments=0, hours_ago=100),
+    ]
+    selected = select_posts_for_comments(posts, budget=2, min_score=1)
+    urls = [context["post_url"] for context, _ in selected]
+    assert urls == ["https://www.instagram.com/p/a2/", "https://www.instagram.com/p/b1/"]
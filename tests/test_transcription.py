@@ -0,0 +1,65 @@
+import asyncio
+import io
+
+import main
+from media import plan_segments
+
+
+def test_plan_segments_cuts_in_silences():
+    silences = [(280.0, 282.0), (590.0, 592.0), (870.0, 872.0)]
+    segments = plan_segments(1000.0, silences, target_secs=300.0, max_secs=600.0)
+    assert segments == [(0.0, 281.0), (281.0, 591.0), (591.0, 871.0), (871.0, 1000.0)]
+
+
+def test_plan_segments_hard_cut_and_short_tail():
+    # No silence in range: cut hard at the target; a tail under a second is folded in
+    assert plan_segments(600.5, [], target_secs=300.0, max_secs=600.0) == [(0.0, 300.0), (300.0, 600.5)]
+    assert plan_segments(200.0, [], target_secs=300.0, max_secs=600.0) == [(0.0, 200.0)]
+
+
+def test_segmented_transcript_is_stitched_in_order(monkeypatch):
+    duration = 1000.0
+    silences = [(280.0, 282.0), (590.0, 592.0), (870.0, 872.0)]
+    segments = plan_segments(duration, silences, main.settings.transcribe_segment_target_secs,
+                             main.settings.transcribe_segment_max_secs)
+
+    # Stand in for ffmpeg: every segment file holds one byte per second of audio
+    async def extract_audio(ffmpeg, input_path, output_path, sample_rate, bitrate):
+        with open(output_path, "wb") as f:
+            f.write(b"a" * int(duration))
+
+    async def detect_silences(ffmpeg, audio_path, noise_db, min_silence_secs):
+        return duration, silences
+
+    async def cut_segment(ffmpeg, audio_path, start, end, output_path):
+        with open(output_path, "wb") as f:
+            f.write(b"a" * int(end - start))
+
+    monkeypatch.setattr(main, "ffmpeg_available", lambda path: True)
+    monkeypatch.setattr(main, "extract_audio", extract_audio)
+    monkeypatch.setattr(main, "detect_silences", detect_silences)
+    monkeypatch.setattr(main, "cut_segment", cut_segment)
+    monkeypatch.setattr(main.settings, "transcribe_segmented", True)
+    monkeypatch.setattr(main.settings, "transcriber", "fake")
+
+    # Later segments finish first, so the join has to restore the order
+    fake = main.TRANSCRIBERS["fake"]
+
+    async def out_of_order(file, filename):
+        index = int(filename.split("-")[1].split(".")[0])
+        await asyncio.sleep(0.01 * (len(segments) - index))
+        return await fake(file, filename)
+
+    text = asyncio.run(main.transcribe_media(io.BytesIO(b"video"), "clip.mp4", transcriber=out_of_order))
+    expected = " ".join(
+        f"[segment-{i:04d}.m4a: {int(end - start)} bytes]" for i, (start, end) in enumerate(segments)
+    )
+    assert text == expected
+    assert len(segments) == 4
+
+
+def test_fake_transcriber_is_the_configured_default(monkeypatch):
+    monkeypatch.setattr(main.settings, "transcriber", "fake")
+    monkeypatch.setattr(main.settings, "transcribe_segmented", False)
+    text = asyncio.run(main.transcribe_media(io.BytesIO(b"12345"), "note.mp3"))
+    assert text == "[note.mp3: 5 bytes]"
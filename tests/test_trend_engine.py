@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from trend_engine import compute_hashtag_trends
+
+
+def _hours_ago(hours):
+    return (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+
+
+def _instagram_post(post_id, tags, likes, comments, hours_ago):
+    return {
+        "_platform": "instagram",
+        "id": post_id,
+        "shortCode": f"SC{post_id}",
+        "url": f"https://www.instagram.com/p/SC{post_id}/",
+        "caption": " ".join(f"#{tag}" for tag in tags),
+        "hashtags": tags,
+        "ownerUsername": f"owner{post_id}",
+        "ownerFullName": f"Owner {post_id}",
+        "displayUrl": f"https://scontent.cdninstagram.com/{post_id}.jpg",
+        "likesCount": likes,
+        "commentsCount": comments,
+        "timestamp": _hours_ago(hours_ago),
+        "latestComments": [{"text": "nice"}] * 20,
+        "childPosts": [{"id": "child"}],
+    }
+
+
+def test_sample_posts_keep_the_raw_post_fields():
+    post = _instagram_post("1", ["ai"], likes=900, comments=30, hours_ago=1)
+    [topic] = compute_hashtag_trends([post])
+    [sample] = topic["sample_posts"]
+
+    for key in ("_platform", "id", "shortCode", "url", "caption", "hashtags", "ownerUsername",
+                "ownerFullName", "displayUrl", "likesCount", "commentsCount", "timestamp"):
+        assert sample[key] == post[key]
+    # Bulky fields are left out
+    assert "latestComments" not in sample and "childPosts" not in sample
+    assert set(topic) == {"topic", "trend_score", "platforms", "post_count",
+                          "total_engagement", "sample_posts", "velocity"}
+
+
+def test_hashtag_trend_scores_and_ordering():
+    posts = [
+        _instagram_post("1", ["ai", "ml"], likes=900, comments=30, hours_ago=1),
+        _instagram_post("2", ["AI"], likes=200, comments=10, hours_ago=2),
+        {**_instagram_post("3", ["ml"], likes=5000, comments=400, hours_ago=0), "timestamp": "2020-01-01T00:00:00"},
+        {
+            "_platform": "linkedin",
+            "urn": "urn:li:4",
+            "text": "Big week #AI #startup",
+            "numLikes": 120,
+            "numComments": 8,
+            "numShares": 4,
+        },
+        {
+            "_platform": "twitter",
+            "id": "5",
+            "text": "#ml #startup thread",
+            "engagement": {"likes": 300, "retweets": 20, "replies": 15, "views": "9000"},
+            "created_at": _hours_ago(3),
+        },
+        {
+            "_platform": "twitter",
+            "id": "6",
+            "text": "quiet #niche",
+            "engagement": {"likes": 1},
+            "created_at": _hours_ago(1),
+        },
+    ]
+    topics = sorted(compute_hashtag_trends(posts), key=lambda t: t["trend_score"], reverse=True)
+
+    # #niche scores too low to be reported
+    assert [t["topic"] for t in topics] == ["#ai", "#ml", "#startup"]
+    assert [t["trend_score"] for t in topics] == [99.36, 90.81, 48.96]
+    assert [set(t["platforms"]) for t in topics] == [
+        {"instagram", "linkedin"}, {"instagram", "twitter"}, {"linkedin", "twitter"},
+    ]
+    assert [t["post_count"] for t in topics] == [3, 3, 2]
+    assert [t["total_engagement"] for t in topics] == [1276, 6685, 491]
+    assert [t["velocity"] for t in topics] == ["+3 posts/24h", "+2 posts/24h", "+2 posts/24h"]
+    assert [[p.get("id") or p.get("urn") for p in t["sample_posts"]] for t in topics] == [
+        ["1", "2", "urn:li:4"], ["1", "3", "5"], ["urn:li:4", "5"],
+    ]
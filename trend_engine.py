@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Union
+
+import numpy as np
+
+from posts import Post, as_posts, is_recent_time
+
+
+def compute_hashtag_trends(all_posts: List[Union[Dict, Post]], timeframe_hours: int = 24) -> List[Dict]:
+    """
+    Score every hashtag in all_posts in a single pass.
+
+    Each Post is laid out once into columnar arrays (recency, engagement,
+    views estimate, platform code); every hashtag occurrence becomes a
+    (tag id, post index) pair, and per-hashtag totals are NumPy group-by sums
+    over those pairs. Each hashtag's score weighs the engagement velocity,
+    engagement rate and count of its recent posts, boosted by the number of
+    platforms the hashtag appears on.
+    Accepts raw post dicts or already-normalized Posts.
+
+    Returns the hashtags scoring above 5, in first-seen order (unsorted).
+    """
+    posts = as_posts(all_posts)
+    n_posts = len(posts)
+    if not n_posts:
+        return []
+
+    cutoff = datetime.utcnow() - timedelta(hours=timeframe_hours)
+
+    # 1. Lay out each post once into columns
+    recent = np.empty(n_posts, dtype=bool)
+    engagement = np.empty(n_posts, dtype=np.float64)
+    views = np.empty(n_posts, dtype=np.float64)
+    platform_code = np.empty(n_posts, dtype=np.int64)
+
+    platform_ids: Dict[str, int] = {}
+    tag_ids: Dict[str, int] = {}
+    occ_tag: List[int] = []
+    occ_post: List[int] = []
+
+    for i, post in enumerate(posts):
+        recent[i] = is_recent_time(post.timestamp, cutoff)
+        engagement[i] = post.engagement
+        views[i] = post.views_estimate
+        platform_code[i] = platform_ids.setdefault(post.platform, len(platform_ids))
+        for tag in post.hashtags:
+            occ_tag.append(tag_ids.setdefault(tag, len(tag_ids)))
+            occ_post.append(i)
+
+    n_tags = len(tag_ids)
+    if not n_tags:
+        return []
+
+    occ_tag = np.asarray(occ_tag, dtype=np.int64)
+    occ_post = np.asarray(occ_post, dtype=np.int64)
+
+    # 2. Group-by sums over hashtag occurrences
+    post_count = np.bincount(occ_tag, minlength=n_tags)
+    total_engagement = np.bincount(occ_tag, weights=engagement[occ_post], minlength=n_tags)
+
+    occ_recent = recent[occ_post]
+    recent_tags = occ_tag[occ_recent]
+    recent_posts = occ_post[occ_recent]
+    recent_count = np.bincount(recent_tags, minlength=n_tags)
+    recent_engagement = np.bincount(recent_tags, weights=engagement[recent_posts], minlength=n_tags)
+    recent_views = np.bincount(recent_tags, weights=views[recent_posts], minlength=n_tags)
+
+    n_platforms = len(platform_ids)
+    tag_platform_pairs = np.unique(occ_tag * n_platforms + platform_code[occ_post])
+    platform_count = np.bincount(tag_platform_pairs // n_platforms, minlength=n_tags)
+
+    # 3. Trend score: 40% velocity, 30% engagement rate, 30% post frequency
+    with np.errstate(divide='ignore', invalid='ignore'):
+        engagement_rate = np.where(recent_views > 0, recent_engagement / recent_views * 100, 0.0)
+    velocity = recent_engagement / timeframe_hours if timeframe_hours > 0 else np.zeros(n_tags)
+    frequency_score = recent_count * 10
+    base_score = velocity * 0.4 + engagement_rate * 0.3 + frequency_score * 0.3
+
+    # Group occurrences by tag (stable, so posts stay in original order) for samples/platforms
+    order = np.argsort(occ_tag, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(post_count)[:-1]))
+    platform_names = list(platform_ids)
+
+    trending_topics = []
+    for hashtag, tag_id in tag_ids.items():
+        trend_score = round(float(base_score[tag_id]), 2) if recent_count[tag_id] else 0.0
+
+        # Boost score if trending on multiple platforms
+        trend_score *= int(platform_count[tag_id]) * 1.5
+        if trend_score <= 5:
+            continue
+
+        occurrences = order[starts[tag_id]:starts[tag_id] + post_count[tag_id]]
+        posts_idx = occ_post[occurrences]
+        platforms = list(dict.fromkeys(platform_names[code] for code in platform_code[posts_idx]))
+
+        trending_topics.append({
+            'topic': f"#{hashtag}",
+            'trend_score': round(trend_score, 2),
+            'platforms': platforms,
+            'post_count': int(post_count[tag_id]),
+            'total_engagement': int(total_engagement[tag_id]),
+            'sample_posts': [posts[i].sample() for i in posts_idx[:5]],
+            'velocity': f"+{int(recent_count[tag_id])} posts/{timeframe_hours}h",
+        })
+
+    return trending_topics